@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# bench_stockfeed.py
+#
+# Load test for stockfeed.py: one FeedServer on localhost, a number of
+# client processes each holding several subscriber connections, and
+# records pushed through as fast as the clients can take them.  Run from
+# this directory, optionally with the number of subscribers.
+
+import asyncio
+import multiprocessing
+import sys
+import time
+
+import stockfeed
+import stocksim
+
+def replay_records():
+    m = stocksim.MarketSimulator()
+    m.add_history(stocksim.history_file)
+    m.reset(stocksim.minutes("9:30am"))
+    return [record for k, record in m.events(1)]
+
+# Runs in each client process: open nconn subscriptions, count frames until
+# the server hangs up and report (frames per connection, finish time)
+def client_process(port,nconn,symbols,results):
+    async def one():
+        reader, writer = await stockfeed.subscribe("127.0.0.1",port,"binary",symbols)
+        count = 0
+        async for frames in stockfeed.read_frame_batches(reader):
+            count += len(frames)
+        writer.close()
+        return count
+
+    async def main():
+        return await asyncio.gather(*(one() for n in range(nconn)))
+
+    counts = asyncio.run(main())
+    results.put((counts,time.time()))
+
+async def run_load(nclients,nprocs,total,batch,symbols):
+    records = replay_records()
+    server = stockfeed.FeedServer()
+    await server.start()
+
+    results = multiprocessing.Queue()
+    per_proc = nclients // nprocs
+    procs = [multiprocessing.Process(target=client_process,
+                                     args=(server.port,per_proc,symbols,results))
+             for n in range(nprocs)]
+    for p in procs:
+        p.start()
+    while len(server.clients) < per_proc*nprocs:
+        await asyncio.sleep(0.01)
+
+    start = time.time()
+    cpu = time.process_time()
+    sent = 0
+    while sent < total:
+        for record in records[sent % len(records):][:batch]:
+            server.update(record)
+            sent += 1
+        await server.send()
+    await server.close()
+    cpu = time.process_time() - cpu
+
+    loop = asyncio.get_running_loop()
+    counts = []
+    finish = start
+    for p in procs:
+        c, t = await loop.run_in_executor(None,results.get)
+        counts.extend(c)
+        finish = max(finish,t)
+    for p in procs:
+        p.join()
+    return sent, counts, finish - start, cpu
+
+def bench_feed(nclients=50,nprocs=5,total=100000,batch=1000,symbols=None):
+    sent, counts, elapsed, cpu = asyncio.run(run_load(nclients,nprocs,total,batch,symbols))
+    if symbols is None:
+        assert all(c == sent for c in counts), counts
+    delivered = sum(counts)
+    print("%d subscribers%s: %d records in %.2fs, %.0f records/s in, %.0f frames/s out" %
+          (len(counts)," (%s)" % ",".join(symbols) if symbols else "",
+           sent,elapsed,sent/elapsed,delivered/elapsed))
+    # with few cores the clients compete with the server for cpu, so also
+    # show what the server itself could push
+    print("    server cpu %.2fs, %.0f records/s per server cpu second" % (cpu,sent/cpu))
+
+if __name__ == '__main__':
+    nclients = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    bench_feed(nclients)
+    bench_feed(nclients,symbols=["IBM","AA","GE"])
@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+# bench_stocksim.py
+#
+# Benchmarks for stocksim.py.  Run from this directory.
+
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+import logwriter
+import stockbars
+import stocksim
+
+# The loader read_history used to be, kept here to compare against
+def read_history_eval(filename):
+    result = []
+    for line in open(filename):
+        str_fields = line.strip().split(",")
+        fields = [eval(x) for x in str_fields]
+        fields[3] = stocksim.minutes(fields[3])
+        result.append(fields)
+    return result
+
+# Write a multi-day history file by repeating dowstocks.csv
+def make_history_file(filename,days):
+    with open(stocksim.history_file) as f:
+        lines = [line for line in f.read().splitlines() if line]
+    with open(filename,"w") as f:
+        for day in range(days):
+            date = '"6/%d/2007"' % (day % 28 + 1)
+            for line in lines:
+                fields = line.split(",")
+                fields[2] = date
+                f.write(",".join(fields) + "\n")
+
+def bench_read_history(days=20):
+    with tempfile.TemporaryDirectory() as d:
+        filename = os.path.join(d,"history.csv")
+        make_history_file(filename,days)
+
+        start = time.time()
+        old = read_history_eval(filename)
+        old_time = time.time() - start
+
+        start = time.time()
+        new = stocksim.read_history(filename)
+        new_time = time.time() - start
+
+    assert new == old
+    print("read_history, %d rows: eval %.3fs, typed %.3fs (%.0fx)" %
+          (len(new),old_time,new_time,old_time/new_time))
+
+# Records as the simulator publishes them, from a fast replay of dowstocks
+def replay_records():
+    m = stocksim.MarketSimulator()
+    m.add_history(stocksim.history_file)
+    m.reset(stocksim.minutes("9:30am"))
+    return [record for k, record in m.events(1)]
+
+def _write_all(printer,records,repeat):
+    start = time.time()
+    for n in range(repeat):
+        for record in records:
+            printer.update(record)
+    if hasattr(printer,"close"):
+        printer.close()
+    else:
+        printer.f.close()
+    return time.time() - start
+
+def bench_log_printer(repeat=30):
+    records = replay_records()
+    total = len(records)*repeat
+    with tempfile.TemporaryDirectory() as d:
+        filename = os.path.join(d,"stocklog.csv")
+        base = _write_all(stocksim.LogPrinter(filename),records,repeat)
+        print("log %d records: LogPrinter %.0f/s" % (total,total/base))
+        for label, kwargs in [("batched csv",{}),
+                              ("batched binary",{"binary":True}),
+                              ("batched csv, 1MB rotation",{"rotate_bytes":1<<20})]:
+            printer = logwriter.BatchedLogPrinter(filename,**kwargs)
+            elapsed = _write_all(printer,records,repeat)
+            print("    %-26s %.0f/s (%.1fx)" % (label,total/elapsed,base/elapsed))
+
+        # binary records read back the same as they were written
+        with logwriter.BatchedLogPrinter(filename,binary=True) as printer:
+            for record in records:
+                printer.update(record)
+        assert list(logwriter.read_binary_log(filename)) == records
+
+class Collector(object):
+    def __init__(self):
+        self.items = []
+    def update(self,item):
+        self.items.append(item)
+
+def _replay(*observers):
+    m = stocksim.MarketSimulator()
+    m.add_history(stocksim.history_file)
+    m.reset(stocksim.minutes("9:30am"))
+    for obj in observers:
+        m.register(obj)
+    start = time.time()
+    m.run(1,fast=True)
+    return time.time() - start
+
+def bench_bars():
+    base = _replay(Collector())
+    bars = stockbars.BarAggregator()
+    closed = Collector()
+    bars.register(closed)
+    elapsed = _replay(bars)
+    bars.flush()
+    print("fast replay: %.3fs, with 1s/1m/5m bars %.3fs, %d bars" %
+          (base,elapsed,len(closed.items)))
+
+# How StockTrack.reset() and set_time() used to find their place: a sort
+# and a linear scan, then walking forward one entry at a time
+def reset_linear(track,t):
+    track.time = t
+    track.history.sort(key=lambda r:r[3])
+    track.index = 0
+    while track.index < len(track.history):
+        if track.history[track.index][3] > t:
+            break
+        track.index += 1
+    track.update()
+    track.low = track.price
+    track.high = track.price
+
+def set_time_linear(track,t):
+    track.time = t
+    while track.index < (len(track.history) - 2) and t >= track.history[track.index+1][3]:
+        track.index += 1
+    track.update()
+
+# Random seeks in one dense track: seek() against resetting and stepping
+# tick by tick, which is how a replay had to get somewhere before
+def bench_seek(points=100000,seeks=100,dt=1):
+    track = stocksim.StockTrack("DENSE")
+    price = 100.0
+    for n in range(points):
+        price = round(max(1.0,price + random.uniform(-0.05,0.05)),2)
+        track.add_data(["DENSE",price,"6/11/2007",570 + n*0.004,0.0,100.0,0,0,n*10])
+    track.reset(570)
+    ticks = [random.randrange(1,int(points*0.004*60/dt)) for n in range(seeks)]
+
+    start = time.time()
+    old = []
+    times = []
+    for k in ticks:
+        reset_linear(track,570)
+        t = 570
+        for n in range(k):
+            t += dt/60.0
+            set_time_linear(track,t)
+        old.append(track.make_record())
+        times.append(t)
+    linear_time = time.time() - start
+
+    track.reset(570)
+    track.seek(570,dt)                  # builds the running high/low arrays
+    start = time.time()
+    new = []
+    for t in times:
+        track.seek(t,dt)
+        new.append(track.make_record())
+    seek_time = time.time() - start
+    assert new == old
+    print("%d random seeks over %d points: stepping %.3fs, seek %.4fs (%.0fx)" %
+          (seeks,points,linear_time,seek_time,linear_time/seek_time))
+
+# One history file per day, named day01.csv, day02.csv, ...
+def make_day_files(dirname,days):
+    filenames = []
+    for day in range(days):
+        filename = os.path.join(dirname,"day%02d.csv" % (day+1))
+        make_history_file(filename,1)
+        with open(filename) as f:
+            data = f.read().replace('"6/1/2007"','"6/%d/2007"' % (day+1))
+        with open(filename,"w") as f:
+            f.write(data)
+        filenames.append(filename)
+    return filenames
+
+class Counter(object):
+    def __init__(self):
+        self.count = 0
+    def update(self,record):
+        self.count += 1
+
+# Memory for a multi-day replay against just loading the same history
+def bench_replay(days=30):
+    with tempfile.TemporaryDirectory() as d:
+        filenames = make_day_files(d,days)
+
+        tracemalloc.start()
+        history = [stocksim.read_history(f) for f in filenames]
+        loaded = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        del history
+
+        m = stocksim.MarketSimulator()
+        c = Counter()
+        m.register(c)
+        start = time.time()
+        m.replay(filenames,1,fast=True)
+        elapsed = time.time() - start
+
+        tracemalloc.start()
+        stocksim.MarketSimulator().replay(filenames,1,fast=True)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    print("replay %d days: %d records in %.2fs, peak %.1fMB (loading all history: %.1fMB)" %
+          (days,c.count,elapsed,peak/1e6,loaded/1e6))
+
+if __name__ == '__main__':
+    bench_read_history()
+    bench_log_printer()
+    bench_bars()
+    bench_seek()
+    bench_replay()
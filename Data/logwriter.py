@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# logwriter.py
+#
+# Buffered replacement for stocksim.LogPrinter.  LogPrinter writes and
+# flushes every record, which is a system call per tick.  BatchedLogPrinter
+# collects records in memory and writes them out in one go once enough
+# bytes have piled up or enough time has passed since the last flush.
+#
+# Log files can be rotated when they pass a size limit and/or when the
+# trading day (the date field of the records) changes.  The live file
+# always keeps the given name; rotated files get .1, .2, ... appended in
+# the order they were closed.
+#
+# Besides CSV (the same lines LogPrinter writes) records can be written in
+# a fixed width binary format, 74 bytes per record, little endian:
+#
+#    8s  name     symbol, NUL padded
+#    d   price
+#    10s date     e.g. 6/11/2007, NUL padded
+#    8s  time     minutes_to_str() string, e.g. 09:30.15
+#    d   change
+#    d   open
+#    d   high
+#    d   low
+#    q   volume
+#
+# read_binary_log() turns such a file back into records.
+
+import os
+import struct
+import time
+
+from stocksim import csv_record
+
+binary_record = struct.Struct("<8sd10s8sddddq")
+
+def pack_record(record):
+    name,price,date,tm,change,opn,high,low,volume = record
+    return binary_record.pack(name.encode(),price,date.encode(),tm.encode(),
+                              change,opn,high,low,volume)
+
+def decode_record(fields):
+    name,price,date,tm,change,opn,high,low,volume = fields
+    return [name.rstrip(b"\0").decode(),price,date.rstrip(b"\0").decode(),
+            tm.rstrip(b"\0").decode(),change,opn,high,low,volume]
+
+def unpack_record(data):
+    return decode_record(binary_record.unpack(data))
+
+def read_binary_log(filename):
+    with open(filename,"rb") as f:
+        data = f.read()
+    for fields in binary_record.iter_unpack(data):
+        yield decode_record(fields)
+
+class BatchedLogPrinter(object):
+    def __init__(self,filename,binary=False,flush_bytes=1<<16,flush_interval=1.0,
+                 rotate_bytes=None,rotate_daily=False):
+        self.filename = filename
+        self.binary = binary
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.rotate_bytes = rotate_bytes
+        self.rotate_daily = rotate_daily
+        self.rotations = 0
+        self.date = None
+        self.buffer = []
+        self.buffered = 0
+        self.last_flush = time.monotonic()
+        self.f = open(filename,"wb")
+
+    # Nothing touches the file here unless a threshold is crossed.  The time
+    # threshold is only checked when records arrive, so call flush() (or
+    # close()) when the feed goes quiet
+    def update(self,record):
+        if self.rotate_daily and record[2] != self.date:
+            if self.date is not None:
+                self.rotate()
+            self.date = record[2]
+        if self.binary:
+            data = pack_record(record)
+        else:
+            data = (csv_record(record)+"\n").encode()
+        self.buffer.append(data)
+        self.buffered += len(data)
+        if (self.buffered >= self.flush_bytes or
+            time.monotonic() - self.last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.f.write(b"".join(self.buffer))
+            self.f.flush()
+            self.buffer = []
+            self.buffered = 0
+        self.last_flush = time.monotonic()
+        if self.rotate_bytes is not None and self.f.tell() >= self.rotate_bytes:
+            self.rotate()
+
+    # Close the current file, move it aside and start a new one
+    def rotate(self):
+        self.write_buffer()
+        self.f.close()
+        self.rotations += 1
+        os.replace(self.filename,"%s.%d" % (self.filename,self.rotations))
+        self.f = open(self.filename,"wb")
+
+    def write_buffer(self):
+        if self.buffer:
+            self.f.write(b"".join(self.buffer))
+            self.buffer = []
+            self.buffered = 0
+
+    def close(self):
+        self.write_buffer()
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,ty,val,tb):
+        self.close()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# stockbars.py
+#
+# OHLCV bars built from the simulator's records as they arrive.
+# BarAggregator is an observer; for every symbol and every bar interval
+# it keeps one small list for the bar in progress
+#
+#    [start, open, high, low, close, base volume, volume]
+#
+# and updates it in place, so a tick costs the same however many have come
+# before.  Records carry the session volume so far, so a bar's volume is
+# the last volume seen minus the volume when the previous bar closed.
+#
+# A bar is closed when the first tick of that symbol in a later interval
+# comes in (or by flush() at the end) and is then published to the
+# aggregator's own observers as
+#
+#    [name, interval, start, open, high, low, close, volume]
+#
+# with interval in seconds and start as an hh:mm.ss string like the records.
+
+from stocksim import MarketSimulator, history_file, minutes
+
+class BarAggregator(object):
+    def __init__(self,intervals=(1,60,300)):
+        self.intervals = tuple(intervals)
+        self.bars = [{ } for i in self.intervals]
+        self.seconds = { }              # time string -> seconds, shared by every symbol
+        self.observers = []
+
+    def register(self,observer):
+        self.observers.append(observer)
+
+    def publish(self,bar):
+        for obj in self.observers:
+            obj.update(bar)
+
+    def tick_seconds(self,tm):
+        t = self.seconds.get(tm)
+        if t is None:
+            hours, rest = tm.split(":")
+            mins, secs = rest.split(".")
+            t = self.seconds[tm] = int(hours)*3600 + int(mins)*60 + int(secs)
+        return t
+
+    def update(self,record):
+        name = record[0]
+        price = record[1]
+        volume = record[8]
+        t = self.tick_seconds(record[3])
+        for interval, bars in zip(self.intervals,self.bars):
+            start = t - t % interval
+            bar = bars.get(name)
+            if bar is None:
+                bars[name] = [start,price,price,price,price,volume,volume]
+            elif bar[0] != start:
+                self.close(name,interval,bar)
+                bars[name] = [start,price,price,price,price,bar[6],volume]
+            else:
+                if price > bar[2]:
+                    bar[2] = price
+                elif price < bar[3]:
+                    bar[3] = price
+                bar[4] = price
+                bar[6] = volume
+
+    def close(self,name,interval,bar):
+        start, opn, high, low, close, base, volume = bar
+        tm = "%02d:%02d.%02d" % (start//3600,start//60 % 60,start % 60)
+        self.publish([name,interval,tm,opn,high,low,close,volume-base])
+
+    # Close every bar still in progress, e.g. when the session is over
+    def flush(self):
+        for interval, bars in zip(self.intervals,self.bars):
+            for name, bar in bars.items():
+                self.close(name,interval,bar)
+            bars.clear()
+
+class BarPrinter(object):
+    def update(self,bar):
+        print("%-6s %4ds %s %8.2f %8.2f %8.2f %8.2f %10d" % tuple(bar))
+
+if __name__ == '__main__':
+    m = MarketSimulator()
+    m.add_history(history_file)
+    m.reset(minutes("9:30am"))
+    bars = BarAggregator(intervals=(60,300))
+    bars.register(BarPrinter())
+    m.register(bars)
+    m.run(1)
+    bars.flush()
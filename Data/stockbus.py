@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# stockbus.py
+#
+# Asyncio publish/subscribe fan-out for the market simulator.  Instead of
+# the simulator calling every observer's update() in turn (so one slow
+# observer holds up the clock), each subscriber gets its own bounded queue
+# and its own task draining it.  What happens when a queue is full is up
+# to the subscriber:
+#
+#    block        the publisher waits for room (nothing is lost)
+#    drop-oldest  the oldest queued record is thrown away
+#    coalesce     only the latest record per symbol is kept
+#
+# Plain observers with a regular update() method, such as BasicPrinter
+# and LogPrinter, get wrapped in SyncObserver, which runs them in a worker
+# thread so blocking I/O doesn't stall the event loop.
+
+import asyncio
+import collections
+import inspect
+import logging
+
+from stocksim import (BasicPrinter, LogPrinter, MarketSimulator, history_file,
+                      minutes)
+
+policies = ("block", "drop-oldest", "coalesce")
+
+log = logging.getLogger(__name__)
+
+# Adapter for observers with a plain update(record) method.  A whole batch
+# of queued records goes to the thread in one go rather than one hop each
+class SyncObserver(object):
+    def __init__(self,observer):
+        self.observer = observer
+
+    def _update_many(self,records):
+        for record in records:
+            self.observer.update(record)
+
+    async def update_many(self,records):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None,self._update_many,records)
+
+class Subscriber(object):
+    def __init__(self,observer,maxsize=1000,policy="block"):
+        if policy not in policies:
+            raise ValueError("policy must be one of %s" % ", ".join(policies))
+        self.observer = observer
+        self.maxsize = maxsize
+        self.policy = policy
+        self.dropped = 0
+        self.closed = False
+        self.finished = False           # set once run() has returned, for any reason
+        # coalescing keys the queue on symbol so a newer record replaces the
+        # queued one (keeping its place in line)
+        self.pending = {} if policy == "coalesce" else collections.deque()
+        self.ready = asyncio.Event()
+        self.space = asyncio.Event()
+
+    async def put(self,record):
+        if self.policy == "coalesce":
+            name = record[0]
+            if name in self.pending:
+                self.dropped += 1
+            elif len(self.pending) >= self.maxsize:
+                del self.pending[next(iter(self.pending))]
+                self.dropped += 1
+            self.pending[name] = record
+        elif self.policy == "drop-oldest":
+            if len(self.pending) >= self.maxsize:
+                self.pending.popleft()
+                self.dropped += 1
+            self.pending.append(record)
+        else:
+            while len(self.pending) >= self.maxsize and not self.finished:
+                self.space.clear()
+                await self.space.wait()
+            if self.finished:
+                # nobody is draining the queue any more, don't hold up the bus
+                self.dropped += 1
+                return
+            self.pending.append(record)
+        self.ready.set()
+
+    def _take(self):
+        if self.policy == "coalesce":
+            batch = list(self.pending.values())
+        else:
+            batch = list(self.pending)
+        self.pending.clear()
+        self.ready.clear()
+        self.space.set()
+        return batch
+
+    # Drain the queue until the bus is closed and everything has been delivered.
+    # An observer that raises loses the rest of that batch but keeps getting
+    # records; should the task die anyway, finished wakes up blocked publishers
+    async def run(self):
+        try:
+            while True:
+                await self.ready.wait()
+                batch = self._take()
+                if batch:
+                    try:
+                        await self.deliver(batch)
+                    except Exception:
+                        log.exception("observer %r failed",self.observer)
+                if self.closed and not self.pending:
+                    break
+        finally:
+            self.finished = True
+            self.space.set()
+
+    async def deliver(self,batch):
+        if hasattr(self.observer,"update_many"):
+            await self.observer.update_many(batch)
+        else:
+            for record in batch:
+                await self.observer.update(record)
+
+    def close(self):
+        self.closed = True
+        self.ready.set()
+
+class AsyncBus(object):
+    def __init__(self):
+        self.subscribers = []
+        self.tasks = []
+
+    # Observers whose update() isn't a coroutine get the SyncObserver adapter
+    def subscribe(self,observer,maxsize=1000,policy="block"):
+        if not (hasattr(observer,"update_many") or
+                inspect.iscoroutinefunction(getattr(observer,"update",None))):
+            observer = SyncObserver(observer)
+        sub = Subscriber(observer,maxsize,policy)
+        self.subscribers.append(sub)
+        return sub
+
+    def start(self):
+        self.tasks = [asyncio.ensure_future(sub.run()) for sub in self.subscribers]
+
+    async def publish(self,record):
+        for sub in self.subscribers:
+            await sub.put(record)
+
+    # Let every subscriber finish what is queued and stop
+    async def close(self):
+        for sub in self.subscribers:
+            sub.close()
+        await asyncio.gather(*self.tasks,return_exceptions=True)
+
+# Drive a MarketSimulator through the bus.  Same timing as
+# MarketSimulator.run(), but waiting happens with asyncio.sleep() so the
+# subscribers keep running in the meantime
+async def run_async(sim,bus,dt,fast=False,end=1000):
+    loop = asyncio.get_running_loop()
+    bus.start()
+    wall_start = loop.time()
+    tick = 0
+    for k, record in sim.events(dt,end):
+        if k != tick:
+            tick = k
+            delay = wall_start + (k-1)*dt - loop.time()
+            # even in fast mode give the subscribers a turn once per tick
+            await asyncio.sleep(delay if delay > 0 and not fast else 0)
+        await bus.publish(record)
+    await bus.close()
+
+if __name__ == '__main__':
+    m = MarketSimulator()
+    m.add_history(history_file)
+    m.reset(minutes("9:30am"))
+    bus = AsyncBus()
+    bus.subscribe(BasicPrinter(),policy="block")
+    bus.subscribe(LogPrinter("stocklog.csv"),policy="coalesce")
+    asyncio.run(run_async(m,bus,1))
@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+# stockfeed.py
+#
+# Socket publisher for the market simulator, so one simulator can feed
+# any number of local consumer processes.
+#
+# TCP clients connect and send a single subscription line:
+#
+#    <format> [SYMBOL,SYMBOL,...]
+#
+# format is "csv" (the same lines LogPrinter writes) or "binary", where
+# every record is a 4 byte big endian length followed by a logwriter
+# binary record.  Leaving out the symbols subscribes to everything.
+#
+# UDP clients send the same line as a datagram to the UDP port and then get
+# one datagram per record, always a bare binary record (the datagram is the
+# frame).  Nothing is resent, so UDP subscribers may miss records.
+#
+# Records are sent a tick at a time: each distinct (format, symbols)
+# subscription gets the batch encoded and joined once, and every client
+# with that subscription gets it in a single write.
+
+import asyncio
+import struct
+
+from logwriter import pack_record, unpack_record
+from stocksim import MarketSimulator, csv_record, history_file, minutes
+
+length_prefix = struct.Struct(">I")
+
+def encode_csv(record):
+    return (csv_record(record)+"\n").encode()
+
+def encode_binary(record):
+    data = pack_record(record)
+    return length_prefix.pack(len(data)) + data
+
+encoders = { "csv": encode_csv, "binary": encode_binary }
+
+def parse_subscription(line):
+    fields = line.split()
+    if not fields or fields[0] not in encoders:
+        raise ValueError("bad subscription %r" % line)
+    symbols = frozenset(fields[1].split(",")) if len(fields) > 1 else None
+    return fields[0], symbols
+
+class UDPFeed(asyncio.DatagramProtocol):
+    def __init__(self,server):
+        self.server = server
+
+    def datagram_received(self,data,addr):
+        try:
+            fmt, symbols = parse_subscription(data.decode())
+        except (ValueError,UnicodeDecodeError):
+            return
+        self.server.udp_clients[addr] = symbols
+
+class FeedServer(object):
+    # Port 0 picks a free port; the real one is in self.port after start().
+    # A client whose unsent data grows past high_water makes the feed wait
+    # for it to catch up rather than buffering without bound, but only for
+    # up to timeout seconds.  Clients still behind by then are disconnected,
+    # so one stuck subscriber can't hold up everyone else
+    def __init__(self,host="127.0.0.1",port=0,udp_port=None,high_water=1<<20,timeout=1.0):
+        self.host = host
+        self.port = port
+        self.udp_port = udp_port
+        self.high_water = high_water
+        self.timeout = timeout
+        self.clients = { }              # writer -> (format, symbols)
+        self.udp_clients = { }          # address -> symbols
+        self.pending = []
+        self.server = None
+        self.udp = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle,self.host,self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        if self.udp_port is not None:
+            loop = asyncio.get_running_loop()
+            self.udp, _ = await loop.create_datagram_endpoint(
+                lambda: UDPFeed(self), local_addr=(self.host,self.udp_port))
+            self.udp_port = self.udp.get_extra_info("sockname")[1]
+
+    async def handle(self,reader,writer):
+        try:
+            self.clients[writer] = parse_subscription((await reader.readline()).decode())
+            # clients don't send anything else, so this returns once they leave
+            await reader.read()
+        except (ValueError,UnicodeDecodeError,ConnectionError):
+            pass
+        self.clients.pop(writer,None)
+        writer.close()
+
+    # Observer interface, so the server can be registered on a simulator.
+    # Records are queued until the next send()
+    def update(self,record):
+        self.pending.append(record)
+
+    async def send(self):
+        records, self.pending = self.pending, []
+        if not records:
+            return
+        groups = { }
+        for writer, key in list(self.clients.items()):
+            groups.setdefault(key,[]).append(writer)
+
+        encoded = { }
+        slow = []
+        for (fmt, symbols), writers in groups.items():
+            if fmt not in encoded:
+                encoded[fmt] = [encoders[fmt](r) for r in records]
+            if symbols is None:
+                data = b"".join(encoded[fmt])
+            else:
+                data = b"".join([d for r, d in zip(records,encoded[fmt]) if r[0] in symbols])
+            if not data:
+                continue
+            for writer in writers:
+                if writer.is_closing():
+                    continue
+                writer.write(data)
+                if writer.transport.get_write_buffer_size() > self.high_water:
+                    slow.append(writer)
+
+        if self.udp_clients:
+            packed = [pack_record(r) for r in records]
+            for addr, symbols in list(self.udp_clients.items()):
+                for r, d in zip(records,packed):
+                    if symbols is None or r[0] in symbols:
+                        self.udp.sendto(d,addr)
+
+        if slow:
+            await self.catch_up(slow)
+
+    async def drain(self,writer):
+        try:
+            await writer.drain()
+        except ConnectionError:
+            self.clients.pop(writer,None)
+            writer.close()
+
+    # Wait for the writers to drain and drop the ones that don't in time,
+    # throwing away whatever is still buffered for them
+    async def catch_up(self,writers):
+        drains = [asyncio.ensure_future(self.drain(w)) for w in writers]
+        done, pending = await asyncio.wait(drains,timeout=self.timeout)
+        for writer, task in zip(writers,drains):
+            if task in pending:
+                task.cancel()
+                self.clients.pop(writer,None)
+                writer.transport.abort()
+
+    # Send what is left, then hang up on everyone so clients see end of file
+    async def close(self):
+        await self.send()
+        writers = list(self.clients)
+        if writers:
+            await self.catch_up(writers)
+        for writer in writers:
+            writer.close()
+        self.server.close()
+        await self.server.wait_closed()
+        if self.udp is not None:
+            self.udp.close()
+
+# Drive a MarketSimulator into a FeedServer, one send per tick
+async def run_feed(sim,server,dt,fast=False,end=1000):
+    loop = asyncio.get_running_loop()
+    wall_start = loop.time()
+    tick = 0
+    for k, record in sim.events(dt,end):
+        if k != tick:
+            await server.send()
+            tick = k
+            delay = wall_start + (k-1)*dt - loop.time()
+            await asyncio.sleep(delay if delay > 0 and not fast else 0)
+        server.update(record)
+    await server.close()
+
+# Client side
+async def subscribe(host,port,fmt="binary",symbols=None):
+    reader, writer = await asyncio.open_connection(host,port)
+    line = fmt if not symbols else "%s %s" % (fmt,",".join(symbols))
+    writer.write((line+"\n").encode())
+    await writer.drain()
+    return reader, writer
+
+# Split a buffer into complete length-prefixed frames, returning the frame
+# payloads and whatever is left over at the end
+def split_frames(buf):
+    frames = []
+    pos = 0
+    end = len(buf)
+    while end - pos >= 4:
+        (n,) = length_prefix.unpack_from(buf,pos)
+        if end - pos - 4 < n:
+            break
+        frames.append(buf[pos+4:pos+4+n])
+        pos += 4+n
+    return frames, buf[pos:]
+
+# Yield the frames that arrive with each read, a list at a time, until the
+# server hangs up
+async def read_frame_batches(reader,chunksize=1<<18):
+    rest = b""
+    while True:
+        chunk = await reader.read(chunksize)
+        if not chunk:
+            return
+        frames, rest = split_frames(rest + chunk if rest else chunk)
+        yield frames
+
+async def read_records(reader):
+    async for frames in read_frame_batches(reader):
+        for frame in frames:
+            yield unpack_record(frame)
+
+if __name__ == '__main__':
+    async def main():
+        m = MarketSimulator()
+        m.add_history(history_file)
+        m.reset(minutes("9:30am"))
+        server = FeedServer(port=8000,udp_port=8001)
+        await server.start()
+        print("feeding on tcp port %d, udp port %d" % (server.port,server.udp_port))
+        await run_feed(m,server,1)
+    asyncio.run(main())
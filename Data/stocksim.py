@@ -9,6 +9,10 @@
 # The purpose of this module is to provide data to the user
 # in different ways in order to write interesting Python examples
 
+import bisect
+import csv
+import heapq
+import itertools
 import math
 import time
 import threading
@@ -40,14 +44,95 @@ def minutes_to_str(m):
     return "%02d:%02d.%02.f" % (hours,minutes,seconds)
 
 # Read the stock history file as a list of lists
+#
+# Each line is name,price,date,time,change,open,high,low,volume and gets
+# converted with a fixed type per column rather than eval()ing every field.
+# The same few hundred times of day repeat for every symbol (and every day
+# in multi-day files), so each time string is only turned into minutes once
+def iter_history(filename):
+    mins = {}
+    with open(filename, newline="") as f:
+        for row in csv.reader(f):
+            if not row:
+                continue
+            name,price,date,tm,change,opn,high,low,volume = row
+            m = mins.get(tm)
+            if m is None:
+                m = mins[tm] = minutes(tm)
+            yield [name,float(price),date,m,float(change),float(opn),
+                   float(high),float(low),int(volume)]
+
 def read_history(filename):
-    result = []
-    for line in open(filename):
-        str_fields = line.strip().split(",")
-        fields = [eval(x) for x in str_fields]
-        fields[3] = minutes(fields[3])
-        result.append(fields)
-    return result
+    return list(iter_history(filename))
+
+# Sort key for records across several days: ((year, month, day), minutes)
+date_keys = {}
+def history_key(record):
+    key = date_keys.get(record[2])
+    if key is None:
+        month,day,year = record[2].split("/")
+        key = date_keys[record[2]] = (int(year),int(month),int(day))
+    return (key,record[3])
+
+# History files are only roughly in time order (each round of quotes is
+# listed by symbol and some quotes are a few minutes old).  Put records in
+# order with a heap of at most window records, which works as long as no
+# record is more than window places away from where it belongs
+def in_time_order(records,window=250):
+    heap = []
+    for n, record in enumerate(records):
+        heapq.heappush(heap,(history_key(record),n,record))
+        if len(heap) > window:
+            yield heapq.heappop(heap)[2]
+    while heap:
+        yield heapq.heappop(heap)[2]
+
+# Merge several history files (days or symbol shards) into one time ordered
+# stream.  Files are read lazily, so only about window records per file are
+# held at any moment
+def merge_history(filenames,window=250):
+    return heapq.merge(*(in_time_order(iter_history(f),window) for f in filenames),
+                       key=history_key)
+
+# Feeds one trading day of a time ordered record stream (such as
+# merge_history() returns) into a simulator a few quotes at a time, as the
+# clock gets to them.  Symbols get a track when their first quote is read
+# and wait in joined until the simulator starts them
+class HistoryFeed(object):
+    def __init__(self,sim,records,first):
+        self.sim = sim
+        self.records = records
+        self.date = first[2]
+        self.following = first          # next record, not read into a track yet
+        self.joined = []
+
+    # Read one more record of the day; False once the day is over
+    def more(self):
+        record = self.following
+        if record is None or record[2] != self.date:
+            return False
+        self.following = next(self.records,None)
+        track = self.sim.stocks.get(record[0])
+        if track is None:
+            track = self.sim.stocks[record[0]] = StockTrack(record[0])
+            self.joined.append(track)
+        track.append(record)
+        return True
+
+    # Read ahead until the track has three quotes after time t (or there are
+    # no more that day), which is all it looks at to move to t and find its
+    # next event
+    def fill(self,track,t):
+        while (len(track.times) < 3 or track.times[-3] <= t) and self.more():
+            pass
+        if track.index >= 8:
+            track.trim()
+
+    # Skip what is left of the day and return the next day's first record
+    def next_day(self):
+        while self.following is not None and self.following[2] == self.date:
+            self.following = next(self.records,None)
+        return self.following
 
 # Format CSV record
 def csv_record(fields):
@@ -68,24 +153,48 @@ class StockTrack(object):
         self.initial = 0
         self.change  = 0
         self.date    = ""
+        self.times   = None
     def add_data(self,record):
         self.history.append(record)
+        self.times = None
+
+    # Add a quote no earlier than the ones already there, keeping the time
+    # index, for a history that is read while the replay runs
+    def append(self,record):
+        if self.times is None:
+            self.times = [r[3] for r in self.history]
+        if self.times and record[3] < self.times[-1]:
+            raise ValueError("history for %s is out of order" % self.name)
+        self.history.append(record)
+        self.times.append(record[3])
+
+    # Forget the quotes before the current segment.  seek() afterwards only
+    # knows about the range of prices from here on
+    def trim(self):
+        n = self.index
+        del self.history[:n]
+        del self.times[:n]
+        self.index = 0
+        self.start = max(self.start - n, 0)
+        self.extremes = None
     def reset(self,time):
         self.time = time
-        # Sort the history by time
-        self.history.sort(key=lambda t:t[3])
+        # Sort the history by time and index the times (only needed again
+        # once more data has been added)
+        if self.times is None:
+            self.history.sort(key=lambda t:t[3])
+            self.times = [r[3] for r in self.history]
         # Find the first entry who's time is behind the given time
-        self.index = 0
-        while self.index < len(self.history):
-            if self.history[self.index][3] > time:
-                break
-            self.index += 1
+        self.index = bisect.bisect_right(self.times,time)
+        self.start = self.index
+        self.start_time = time
         self.open = self.history[0][5]
         self.initial = self.history[0][1] - self.history[0][4]
         self.date = self.history[0][2]
         self.update()
         self.low = self.price
         self.high = self.price
+        self.extremes = None
 
     # Calculate interpolated value of a given field based on
     # current time
@@ -112,11 +221,116 @@ class StockTrack(object):
         
     # Increment the time by a delta
     def incr(self,dt):
-        self.time += dt
-        if self.index < (len(self.history) - 2):
-            while self.index < (len(self.history) - 2) and self.time >= self.history[self.index+1][3]:
-                self.index += 1
+        self.set_time(self.time + dt)
+
+    # Move to an absolute time (at or after the current one)
+    def set_time(self,time):
+        self.time = time
+        last = len(self.history) - 2
+        if self.index < last and time >= self.times[self.index+1]:
+            self.index = min(bisect.bisect_right(self.times,time,self.index+1) - 1, last)
+        self.update()
+
+    # Jump to any time since the last reset(), forwards or backwards, and end
+    # up with the same record as a replay from the reset time in ticks of dt
+    # seconds that then moved to time.  High and low are the extremes of the
+    # rounded price at those ticks.  Within one history segment the price
+    # line only goes one way, so just the first and last tick in each segment
+    # count; running max/min over the segments are built on the first seek
+    # with a given dt
+    def seek(self,time,dt):
+        if self.extremes is None or self.extremes[0] != dt:
+            self.extremes = (dt,) + self.tick_extremes(dt)
+        dt, ticks, highs, lows = self.extremes
+        self.time = time
+        passed = bisect.bisect_right(self.times,time)
+        self.index = max(self.start, min(passed - 1, len(self.history) - 2))
         self.update()
+        self.high = self.low = self.price
+        # the ticks in the current segment come before time
+        j = self.index
+        a = bisect.bisect_left(ticks,self.segment_start(j))
+        if ticks[a] < time:
+            p = self.segment_price(j,ticks[a])
+            self.high = max(self.high,p)
+            self.low = min(self.low,p)
+        if j > self.start:
+            self.high = max(self.high,highs[j-1-self.start])
+            self.low = min(self.low,lows[j-1-self.start])
+
+    # Tick times from the reset time (added up like events() does) until
+    # the last history point, and the running high/low of the prices at
+    # those ticks over the segments that end before it
+    def tick_extremes(self,dt):
+        dtm = dt/60.0
+        last = len(self.history) - 2
+        ticks = [self.start_time]
+        while ticks[-1] < self.times[last]:
+            ticks.append(ticks[-1] + dtm)
+        high, low = float("-inf"), float("inf")
+        highs, lows = [], []
+        for j in range(self.start,last):
+            a = bisect.bisect_left(ticks,self.segment_start(j))
+            b = bisect.bisect_left(ticks,self.times[j+1]) - 1
+            if a <= b:
+                first, end = self.segment_price(j,ticks[a]), self.segment_price(j,ticks[b])
+                high = max(high,first,end)
+                low = min(low,first,end)
+            highs.append(high)
+            lows.append(low)
+        return ticks, highs, lows
+
+    # Segment j is the one in use from this time until times[j+1]
+    def segment_start(self,j):
+        return self.start_time if j == self.start else self.times[j]
+
+    # Rounded price at time t, computed exactly like update() does, assuming
+    # t is still inside the current history segment
+    def price_at(self,t):
+        return self.segment_price(self.index,t)
+
+    def segment_price(self,j,t):
+        first = self.history[j][1]
+        next  = self.history[j+1][1]
+        first_t = self.history[j][3]
+        next_t = self.history[j+1][3]
+        try:
+            slope = (next - first)/(next_t-first_t)
+            return round(first + slope*(t - first_t),2)
+        except ZeroDivisionError:
+            return round(first,2)
+
+    # Find the first tick after tick k at which this track has to be looked
+    # at again: either the rounded price moves off its current value or the
+    # next history point is reached (and the slope changes).  Tick j happens
+    # at times[j].  Returns a tick > last if nothing happens before then
+    def next_event(self,k,times,last):
+        def tick_at(t):
+            # first tick j > k with times[j] >= t
+            return bisect.bisect_left(times,t,k+1,last+1)
+
+        if self.index < (len(self.history) - 2):
+            end = tick_at(self.history[self.index+1][3])
+        else:
+            end = last+1
+
+        first = self.history[self.index][1]
+        next  = self.history[self.index+1][1]
+        first_t = self.history[self.index][3]
+        next_t = self.history[self.index+1][3]
+        if next == first or next_t == first_t:
+            return end
+        slope = (next - first)/(next_t-first_t)
+
+        # Estimate when the line crosses the next rounding boundary and then
+        # correct the guess by evaluating the real rounded price
+        boundary = self.price + (0.005 if slope > 0 else -0.005)
+        j = min(tick_at(first_t + (boundary - first)/slope), end)
+        while j > k+1 and self.price_at(times[j-1]) != self.price:
+            j -= 1
+        while j < end and self.price_at(times[j]) == self.price:
+            j += 1
+        return j
 
     def make_record(self):
         return [self.name,round(self.price,2),self.date,minutes_to_str(self.time),round(self.change,2),self.open,round(self.high,2),
@@ -135,30 +349,128 @@ class MarketSimulator(object):
         for obj in self.observers:
             obj.update(record)
     def add_history(self,filename):
-        hist = read_history(filename)
-        for record in hist:
+        self.add_records(read_history(filename))
+
+    def add_records(self,records):
+        for record in records:
             if record[0] not in self.stocks:
                 self.stocks[record[0]] = StockTrack(record[0])
-            self.stocks[record[0]].add_data(record) 
+            self.stocks[record[0]].add_data(record)
 
     def reset(self,time):
         self.time = time
         for s in list(self.stocks.values()):
             s.reset(time)
 
-    # Run forever.  Dt is in seconds
-    def run(self,dt):
+    # Jump the replay to another time of the day without a full reset, with
+    # the records a run in ticks of dt since the reset would have at time.
+    # The next run() or events() carries on from there
+    def seek(self,time,dt):
+        self.time = time
         for s in self.stocks:
+            self.stocks[s].seek(time,dt)
             self.prices[s] = self.stocks[s].price
-            self.publish(self.stocks[s].make_record())
-        while self.time < 1000:
-            for s in self.stocks:
-                self.stocks[s].incr(dt/60.0)    # Increment is in minutes
-                if self.stocks[s].price != self.prices[s]:
-                    self.prices[s] = self.stocks[s].price
-                    self.publish(self.stocks[s].make_record())
-            time.sleep(dt)
-            self.time += (dt/60.0)
+
+    # Generate (tick, record) for every record published while running until
+    # the end of the day (end, in minutes).  Dt is in seconds and tick k is due k-1 ticks of
+    # wall clock time after the start (the opening records are tick 0).
+    #
+    # Time advances in ticks of dt, but rather than stepping every stock on
+    # every tick, each stock sits in a heap keyed on the next tick where its
+    # price can change, and the simulator jumps straight from one event to
+    # the next.
+    #
+    # With a HistoryFeed the history is read as the clock moves instead of
+    # being loaded up front.  Stocks the feed turns up are started on the
+    # tick they are read, with their opening record published then.
+    def events(self,dt,end=1000,feed=None):
+        for s in self.stocks:
+            self.prices[s] = self.stocks[s].price
+            yield 0, self.stocks[s].make_record()
+
+        # Tick k happens at times[k].  The clock is advanced by adding dt
+        # once per tick, exactly as the stepping loop used to, so replays
+        # land on the same float times; ticks 1..last are the ones taken
+        # while the clock is under end
+        dtm = dt/60.0                     # Ticks are in minutes
+        times = [self.time]
+        while times[-1] < end:
+            times.append(times[-1] + dtm)
+        last = len(times) - 1
+
+        heap = []
+        for order, s in enumerate(self.stocks):
+            heap.append((self.stocks[s].next_event(0,times,last), order, s))
+        heapq.heapify(heap)
+        order = itertools.count(len(heap))
+
+        def join(k):
+            records = []
+            for track in feed.joined:     # fill() may add to this as it goes
+                feed.fill(track,times[k])
+                track.reset(times[k])
+                self.prices[track.name] = track.price
+                records.append(track.make_record())
+                heapq.heappush(heap, (track.next_event(k,times,last), next(order), track.name))
+            del feed.joined[:]
+            return records
+
+        if feed is not None:
+            feed.more()
+            for record in join(0):
+                yield 0, record
+
+        while heap and heap[0][0] <= last:
+            k, n, s = heapq.heappop(heap)
+            track = self.stocks[s]
+            if feed is not None:
+                feed.fill(track,times[k])
+            track.set_time(times[k])
+            if track.price != self.prices[s]:
+                self.prices[s] = track.price
+                yield k, track.make_record()
+            heapq.heappush(heap, (track.next_event(k,times,last), n, s))
+            if feed is not None and feed.joined:
+                for record in join(k):
+                    yield k, record
+
+        # Stocks without an event on the last tick still need their clocks moved
+        for track in list(self.stocks.values()):
+            if feed is not None:
+                feed.fill(track,times[last])
+            track.set_time(times[last])
+        self.time = times[last]
+
+    # Run until the end of the day.  Dt is in seconds.  With fast=True it
+    # doesn't sleep at all and replays the day as fast as possible,
+    # otherwise it sleeps until each event is due.
+    def run(self,dt,fast=False,end=1000,feed=None):
+        wall_start = time.time()
+        for k, record in self.events(dt,end,feed):
+            if not fast:
+                delay = wall_start + (k-1)*dt - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+            self.publish(record)
+
+    # Replay several history files as one stream, a trading day at a time.
+    # Quotes are read from the files as the clock reaches them, so besides
+    # the merge window only a few quotes per symbol are held at once.  Each
+    # day runs from start (by default the day's first quote) until end
+    def replay(self,filenames,dt,start=None,end=1000,fast=False,window=250):
+        done = set()
+        records = merge_history(filenames,window)
+        first = next(records,None)
+        while first is not None:
+            if first[2] in done:
+                raise ValueError("history for %s is out of order" % first[2])
+            done.add(first[2])
+            self.stocks = { }
+            self.prices = { }
+            feed = HistoryFeed(self,records,first)
+            self.time = first[3] if start is None else start
+            self.run(dt,fast,end,feed)
+            first = feed.next_day()
 
 
 class BasicPrinter(object):
@@ -172,12 +484,13 @@ class LogPrinter(object):
         self.f.write(csv_record(record)+"\n")
         self.f.flush()
 
-m = MarketSimulator()
-m.add_history(history_file)
-m.reset(minutes("9:30am"))
-m.register(BasicPrinter())
-m.register(LogPrinter("stocklog.csv"))
-m.run(1)
+if __name__ == '__main__':
+    m = MarketSimulator()
+    m.add_history(history_file)
+    m.reset(minutes("9:30am"))
+    m.register(BasicPrinter())
+    m.register(LogPrinter("stocklog.csv"))
+    m.run(1)
 
 
    
@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# stocksim_numpy.py
+#
+# Vectorized backend for the stock market simulator.  Instead of one
+# StockTrack per symbol, the histories of every symbol live in 2-D numpy
+# arrays (one row per symbol) and each tick computes the interpolated
+# price, volume, high, low and change of all symbols in one batched step.
+# It has the same interface as stocksim.MarketSimulator and publishes the
+# same record shape, so observers work with either one.
+
+import random
+import time
+
+import numpy as np
+
+from stocksim import minutes, minutes_to_str, read_history
+
+# np.round() scales by 100 and rounds that, which now and then lands on the
+# other side of a half cent from python's round().  Redo the few values that
+# sit right on a half cent with round() so both backends agree exactly
+def round2(values):
+    result = np.round(values,2)
+    scaled = values*100
+    near = np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)
+    if len(near):
+        result[near] = [round(x,2) for x in values[near].tolist()]
+    return result
+
+class VectorMarketSimulator(object):
+    def __init__(self):
+        self.records = { }
+        self.time = 0
+        self.observers = []
+
+    def register(self,observer):
+        self.observers.append(observer)
+
+    def publish(self,record):
+        for obj in self.observers:
+            obj.update(record)
+
+    def add_history(self,filename):
+        self.add_records(read_history(filename))
+
+    def add_records(self,records):
+        for record in records:
+            self.records.setdefault(record[0], []).append(record)
+
+    # Pack the histories into padded arrays.  Missing slots at the end of a
+    # short history get an infinite time (so they are never reached) and
+    # repeat the last price/volume
+    def _pack(self):
+        self.names = list(self.records)
+        hists = [sorted(self.records[n], key=lambda r: r[3]) for n in self.names]
+        n = len(hists)
+        width = max(len(h) for h in hists)
+        self.lens = np.array([len(h) for h in hists])
+        self.times = np.full((n,width), np.inf)
+        self.hprices = np.zeros((n,width))
+        self.hvolumes = np.zeros((n,width))
+        for i, h in enumerate(hists):
+            self.times[i,:len(h)] = [r[3] for r in h]
+            self.hprices[i,:len(h)] = [r[1] for r in h]
+            self.hprices[i,len(h):] = h[-1][1]
+            self.hvolumes[i,:len(h)] = [r[-1] for r in h]
+            self.hvolumes[i,len(h):] = h[-1][-1]
+        self.dates = [h[0][2] for h in hists]
+        self.open = np.array([h[0][5] for h in hists], dtype=float)
+        self.initial = np.array([h[0][1] - h[0][4] for h in hists], dtype=float)
+        self.rows = np.arange(n)
+
+    def reset(self,time):
+        self.time = time
+        self._pack()
+        # Same as StockTrack.reset: the first entry whose time is after time
+        # (kept far enough from the end that there is always a next entry)
+        self.index = np.minimum((self.times <= time).sum(axis=1), self.lens - 2)
+        self.update(time)
+        self.low = self.price.copy()
+        self.high = self.price.copy()
+
+    # Interpolate every symbol at once
+    def interpolate(self,values,t):
+        first = values[self.rows,self.index]
+        next = values[self.rows,self.index+1]
+        first_t = self.times[self.rows,self.index]
+        next_t = self.times[self.rows,self.index+1]
+        span = next_t - first_t
+        slope = np.divide(next-first,span,out=np.zeros_like(first),where=span != 0)
+        return first + slope*(t - first_t)
+
+    def update(self,t):
+        self.price = round2(self.interpolate(self.hprices,t))
+        self.volume = self.interpolate(self.hvolumes,t).astype(np.int64)
+        self.change = self.price - self.initial
+
+    # Advance every symbol to time t.  The clock only moves forward, so
+    # a symbol's index moves up at most a step or two per tick
+    def set_time(self,t):
+        while True:
+            ahead = ((self.index < self.lens - 2) &
+                     (t >= self.times[self.rows,self.index+1]))
+            if not ahead.any():
+                break
+            self.index += ahead
+        self.update(t)
+        np.minimum(self.low,self.price,out=self.low)
+        np.maximum(self.high,self.price,out=self.high)
+
+    def make_records(self,which,t):
+        tm = minutes_to_str(t)
+        price = self.price[which].tolist()
+        change = round2(self.change[which]).tolist()
+        opens = self.open[which].tolist()
+        high = round2(self.high[which]).tolist()
+        low = round2(self.low[which]).tolist()
+        volume = self.volume[which].tolist()
+        for n, i in enumerate(which.tolist()):
+            yield [self.names[i],price[n],self.dates[i],tm,change[n],opens[n],
+                   high[n],low[n],volume[n]]
+
+    # Run until the end of the day (end, in minutes).  Dt is in seconds,
+    # fast=True skips the sleeping between ticks
+    def run(self,dt,fast=False,end=1000):
+        for record in self.make_records(self.rows,self.time):
+            self.publish(record)
+        last = self.price.copy()
+
+        # The clock is stepped by adding dt each tick, like MarketSimulator
+        dtm = dt/60.0
+        t = self.time
+        while t < end:
+            t += dtm
+            self.set_time(t)
+            changed = np.flatnonzero(self.price != last)
+            if len(changed):
+                last[changed] = self.price[changed]
+                for record in self.make_records(changed,t):
+                    self.publish(record)
+            if not fast:
+                time.sleep(dt)
+            self.time = t
+
+# Make up a day of history for n symbols in the same shape read_history()
+# returns: [name, price, date, minutes, change, open, high, low, volume]
+def synthetic_history(nsymbols,points=80,seed=0):
+    rand = random.Random(seed)
+    records = []
+    for s in range(nsymbols):
+        name = "S%04d" % s
+        price = opn = rand.uniform(10,200)
+        volume = 0
+        for p in range(points):
+            t = minutes("9:30am") + p*5
+            price = max(1.0, price + rand.gauss(0,0.3))
+            volume += rand.randint(1000,50000)
+            records.append([name,round(price,2),"6/11/2007",t,round(price-opn,2),
+                            round(opn,2),0,0,volume])
+    return records
+
+if __name__ == '__main__':
+    class Counter(object):
+        def __init__(self):
+            self.count = 0
+        def update(self,record):
+            self.count += 1
+
+    for n in (30, 1000, 5000):
+        m = VectorMarketSimulator()
+        m.add_records(synthetic_history(n))
+        m.reset(minutes("9:30am"))
+        c = Counter()
+        m.register(c)
+        start = time.time()
+        m.run(1,fast=True)
+        elapsed = time.time() - start
+        print("%5d symbols: %.2fs for a day of 1s ticks, %d records" %
+              (n,elapsed,c.count))
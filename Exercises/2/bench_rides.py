@@ -0,0 +1,225 @@
+# benchmarks for the ride readers, run from this directory: python bench_rides.py
+# ctabus.csv is too big to keep in the repo, so these generate a file shaped like it
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from itertools import compress
+
+import colcache
+import parallel_reader
+import read_rides
+import soln2_2
+from columns import CategoricalColumn, make_column, mask_and
+from data_collection import read_csv_as_columns
+from reader import read_csv_as_dicts
+
+RIDE_TYPES = [str, str, str, int]
+
+
+def make_rides_file(filename, nrows):
+    """
+    Write a synthetic file shaped like ctabus.csv (route,date,daytype,rides)
+    """
+    rand = random.Random(nrows)
+    with open(filename, "w") as f:
+        f.write("route,date,daytype,rides\n")
+        for _ in range(nrows):
+            route = str(rand.randint(1, 200))
+            date = "%02d/%02d/%d" % (
+                rand.randint(1, 12),
+                rand.randint(1, 28),
+                rand.randint(2001, 2011),
+            )
+            daytype = rand.choice("WAU")
+            f.write(f"{route},{date},{daytype},{rand.randint(0, 30000)}\n")
+
+
+def bench_parallel_scaling(nrows=2_000_000):
+    with tempfile.TemporaryDirectory() as d:
+        filename = os.path.join(d, "rides.csv")
+        make_rides_file(filename, nrows)
+
+        start = time.perf_counter()
+        read_csv_as_dicts(filename, RIDE_TYPES)
+        base = time.perf_counter() - start
+        print(f"single core read_csv_as_dicts: {nrows / base:>12,.0f} rows/s")
+
+        workers = 1
+        while workers <= (os.cpu_count() or 1):
+            for columns in (False, True):
+                start = time.perf_counter()
+                parallel_reader.read_csv_parallel(
+                    filename, RIDE_TYPES, columns=columns, workers=workers
+                )
+                elapsed = time.perf_counter() - start
+                kind = "columns" if columns else "dicts"
+                print(
+                    f"{workers:>2} workers ({kind:>7}): "
+                    f"{nrows / elapsed:>12,.0f} rows/s  ({base / elapsed:.2f}x)"
+                )
+            workers *= 2
+
+
+def _load_columns(filename, make):
+    routes, dates, numrides = make(), make(), make_column(int)
+    with open(filename) as f:
+        next(f)
+        for line in f:
+            route, date, _, rides = line.split(",")
+            routes.append(route)
+            dates.append(date)
+            numrides.append(int(rides))
+    return routes, dates, numrides
+
+
+def bench_categorical(nrows=1_000_000):
+    with tempfile.TemporaryDirectory() as d:
+        filename = os.path.join(d, "rides.csv")
+        make_rides_file(filename, nrows)
+
+        results = {}
+        for name, make in (("str list", list), ("categorical", CategoricalColumn)):
+            tracemalloc.start()
+            routes, dates, numrides = _load_columns(filename, make)
+            memory = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            results[name] = (memory, routes, dates, numrides)
+
+    routes, dates, numrides = results["str list"][1:]
+    date = dates[0]
+    start = time.perf_counter()
+    expected = sum(
+        n for r, d, n in zip(routes, dates, numrides) if r == "22" and d == date
+    )
+    str_time = time.perf_counter() - start
+
+    routes, dates, numrides = results["categorical"][1:]
+    start = time.perf_counter()
+    total = sum(compress(numrides, mask_and(routes.eq("22"), dates.eq(date))))
+    code_time = time.perf_counter() - start
+    assert total == expected
+
+    # the rides column is the same int array in both, so it's in both totals
+    for name, (memory, *_) in results.items():
+        print(f"{name:>12}: route/date/rides columns hold {memory / 1e6:.1f} MB")
+    print(
+        f"route == '22' and date == {date!r}: strings {str_time:.3f}s, "
+        f"codes {code_time:.3f}s ({str_time / code_time:.1f}x)"
+    )
+
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def bench_query(nrows=1_000_000):
+    """
+    The soln2_2 report as csv row loops vs query.py over columns loaded once
+    """
+    with tempfile.TemporaryDirectory() as d:
+        soln2_2.FILE = os.path.join(d, "rides.csv")
+        make_rides_file(soln2_2.FILE, nrows)
+        rides, load_time = _timed(read_rides.read_rides_as_dicts, soln2_2.FILE)
+
+        questions = [
+            ("number of routes", "get_number_of_rides", ()),
+            ("route 22 rides", "get_bus_rides_on_optional_date", ("22",)),
+            ("totals per route", "total_num_of_rides", ()),
+            ("greatest increase", "get_greatest_ten_yr_increase", (5,)),
+        ]
+        print(f"loading columns once: {load_time:.3f}s")
+        for label, name, args in questions:
+            expected, rows_time = _timed(getattr(soln2_2, name), *args)
+            columns_fn = getattr(soln2_2, name + "_columns")
+            result, query_time = _timed(columns_fn, rides, *args)
+            assert result == expected, (name, result, expected)
+            print(
+                f"{label:>18}: rows {rows_time:.3f}s  query {query_time:.4f}s"
+                f"  ({rows_time / query_time:.0f}x)"
+            )
+
+
+def bench_cache(nrows=1_000_000):
+    """
+    Cold parse (which also writes the sidecar cache) vs warm loads from it
+    """
+    with tempfile.TemporaryDirectory() as d:
+        filename = os.path.join(d, "rides.csv")
+        make_rides_file(filename, nrows)
+
+        cold, cold_time = _timed(read_csv_as_columns, filename, RIDE_TYPES)
+        _timed(read_csv_as_columns, filename, RIDE_TYPES, cache=True)
+        size = os.path.getsize(colcache.cache_path(filename))
+        warm, warm_time = _timed(read_csv_as_columns, filename, RIDE_TYPES, cache=True)
+        assert warm[nrows - 1] == cold[nrows - 1]
+        print(
+            f"columns: parse {cold_time:.3f}s  cached load {warm_time:.4f}s"
+            f"  ({cold_time / warm_time:.0f}x, cache file {size / 1e6:.1f} MB)"
+        )
+
+        # only keep one record of the cold result around, a million live dicts
+        # make every gc pass during the warm load slower
+        cold, cold_time = _timed(read_csv_as_dicts, filename, RIDE_TYPES)
+        last = cold[-1]
+        del cold
+        warm, warm_time = _timed(read_csv_as_dicts, filename, RIDE_TYPES, cache=True)
+        assert warm[-1] == last
+        print(
+            f"  dicts: parse {cold_time:.3f}s  cached load {warm_time:.4f}s"
+            f"  ({cold_time / warm_time:.1f}x)"
+        )
+
+
+def make_wide_file(filename, nrows, ncols=30):
+    """
+    Write a file with a route column followed by ncols - 1 numeric columns
+    """
+    rand = random.Random(nrows)
+    with open(filename, "w") as f:
+        f.write(",".join(["route"] + [f"c{i}" for i in range(1, ncols)]) + "\n")
+        for _ in range(nrows):
+            values = [str(rand.randint(0, 99999)) for _ in range(1, ncols)]
+            f.write(f"{rand.randint(1, 200)}," + ",".join(values) + "\n")
+
+
+def bench_projection(nrows=300_000, ncols=30):
+    """
+    Reading two columns out of a wide file, full csv parse vs mmap projection
+    """
+    with tempfile.TemporaryDirectory() as d:
+        filename = os.path.join(d, "wide.csv")
+        make_wide_file(filename, nrows, ncols)
+        types = [str] + [int] * (ncols - 1)
+        wanted = ["route", "c5"]
+
+        full, full_time = _timed(read_csv_as_dicts, filename, types)
+        expected = [{k: r[k] for k in wanted} for r in full]
+        del full
+        narrow, narrow_time = _timed(read_csv_as_dicts, filename, types, columns=wanted)
+        assert narrow == expected
+        print(
+            f"  dicts: all {ncols} columns {full_time:.3f}s, "
+            f"columns={wanted} {narrow_time:.3f}s ({full_time / narrow_time:.1f}x)"
+        )
+
+        full, full_time = _timed(read_csv_as_columns, filename, types)
+        narrow, narrow_time = _timed(
+            read_csv_as_columns, filename, types, columns=wanted
+        )
+        assert list(narrow.columns["c5"]) == list(full.columns["c5"])
+        print(
+            f"columns: all {ncols} columns {full_time:.3f}s, "
+            f"columns={wanted} {narrow_time:.3f}s ({full_time / narrow_time:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    bench_parallel_scaling()
+    bench_categorical()
+    bench_query()
+    bench_cache()
+    bench_projection()
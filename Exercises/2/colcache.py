@@ -0,0 +1,144 @@
+# sidecar cache of parsed CSV columns, so static files only get parsed once.
+#
+# a cache for data.csv lives next to it in data.csv.colcache and looks like:
+#
+#   b"COLCACHE1\n"              magic
+#   uint32 (little endian)      length of the metadata that follows
+#   metadata (json, utf-8)      source path, mtime_ns, size, schema, byteorder,
+#                               headers, nrows and one entry per column with the
+#                               offset/length of its data, its array typecode
+#                               and (for strings) the category values
+#   column data                 each column's raw array bytes, 8 byte aligned
+#
+# int and float columns are stored as their array.array bytes, string columns
+# as the bytes of their categorical codes. the cache is only trusted when the
+# source path, mtime, size and type schema all still match
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from columns import CategoricalColumn, Categories
+
+MAGIC = b"COLCACHE1\n"
+cacheable_types = {int: "int", float: "float", str: "str"}
+
+
+def _aligned(n):
+    return -(-n // 8) * 8
+
+
+def cache_path(filename):
+    return filename + ".colcache"
+
+
+def _key(filename, types):
+    if not all(t in cacheable_types for t in types):
+        return None
+    stat = os.stat(filename)
+    return {
+        "source": os.path.abspath(filename),
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "schema": [cacheable_types[t] for t in types],
+        "byteorder": sys.byteorder,
+    }
+
+
+def load(filename, types):
+    """
+    Return (headers, columns) from the cache, or None if there is no cache
+    for these types or it is stale
+    """
+    key = _key(filename, types)
+    if key is None:
+        return None
+    try:
+        f = open(cache_path(filename), "rb")
+    except OSError:
+        return None
+    with f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            return None
+        with mm:
+            if mm[: len(MAGIC)] != MAGIC:
+                return None
+            (meta_len,) = struct.unpack_from("<I", mm, len(MAGIC))
+            meta_start = len(MAGIC) + 4
+            meta = json.loads(mm[meta_start : meta_start + meta_len])
+            if any(meta.get(k) != v for k, v in key.items()):
+                return None
+
+            columns = {}
+            for col in meta["columns"]:
+                # one memcpy out of the mapping per column, no parsing at all
+                data = array(col["typecode"])
+                data.frombytes(mm[col["offset"] : col["offset"] + col["nbytes"]])
+                if "categories" in col:
+                    categories = Categories()
+                    categories.values = values = col["categories"]
+                    categories.index = {v: i for i, v in enumerate(values)}
+                    data = CategoricalColumn(data, categories)
+                columns[col["name"]] = data
+    return meta["headers"], columns
+
+
+def store(filename, types, headers, columns):
+    """
+    Write the cache for a parsed file. Files with types the cache can't hold
+    are skipped
+    """
+    key = _key(filename, types)
+    if key is None:
+        return
+
+    blocks = []
+    entries = []
+    for name in headers:
+        column = columns[name]
+        entry = {"name": name}
+        if isinstance(column, CategoricalColumn):
+            entry["categories"] = column.categories.values
+            column = column.codes
+        entry["typecode"] = column.typecode
+        entries.append(entry)
+        blocks.append(column.tobytes())
+
+    def encode(base):
+        offset = base
+        for entry, block in zip(entries, blocks):
+            entry["offset"] = offset
+            entry["nbytes"] = len(block)
+            offset += _aligned(len(block))
+        meta = {
+            **key,
+            "headers": headers,
+            "nrows": len(columns[headers[0]]) if headers else 0,
+            "columns": entries,
+        }
+        return json.dumps(meta).encode()
+
+    # the offsets depend on how long the metadata is and the metadata holds the
+    # offsets, so re-encode until the data start stops moving
+    base = 0
+    while True:
+        meta = encode(base)
+        start = _aligned(len(MAGIC) + 4 + len(meta))
+        if start <= base:
+            break
+        base = start
+
+    tmp = cache_path(filename) + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(meta)))
+        f.write(meta)
+        for entry, block in zip(entries, blocks):
+            f.write(b"\0" * (entry["offset"] - f.tell()))
+            f.write(block)
+    # swap it in all at once so a reader never sees half a cache
+    os.replace(tmp, cache_path(filename))
@@ -0,0 +1,227 @@
+import operator
+import sys
+from array import array
+from collections.abc import Sequence
+from functools import reduce
+
+# array typecodes for the column types we can store unboxed, 8 bytes a value
+# instead of a pointer to a 28-32 byte int/float object
+typecodes = {
+    int: "q",
+    float: "d",
+}
+
+# categorical codes start as single bytes and only widen once a column has
+# seen more distinct values than the current typecode can count
+code_typecodes = [("B", 1 << 8), ("H", 1 << 16), ("I", 1 << 32)]
+
+
+class Categories:
+    """
+    Lookup table of distinct strings, shared by every column (and slice) that
+    was encoded with it
+    """
+
+    def __init__(self):
+        self.values = []
+        self.index = {}
+
+    def __len__(self):
+        return len(self.values)
+
+    def encode(self, value):
+        code = self.index.get(value)
+        if code is None:
+            code = self.index[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def lookup(self, value):
+        return self.index.get(value)
+
+
+class CategoricalColumn(Sequence):
+    """
+    Dictionary-encoded string column: one small int code per row plus a lookup
+    table holding each distinct string once
+    """
+
+    def __init__(self, codes=None, categories=None):
+        self.categories = categories if categories is not None else Categories()
+        if codes is None:
+            codes = array(self._typecode_for(len(self.categories)))
+        self.codes = codes
+
+    @staticmethod
+    def _typecode_for(ncategories):
+        for typecode, limit in code_typecodes:
+            if ncategories <= limit:
+                return typecode
+        raise OverflowError("Too many categories")
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, i):  # type: ignore
+        if isinstance(i, slice):
+            # the slice shares the lookup table, only the codes get copied
+            return CategoricalColumn(self.codes[i], self.categories)
+        return self.categories.values[self.codes[i]]
+
+    # Sequence's default __iter__ goes through __getitem__ one row at a time
+    def __iter__(self):
+        return map(self.categories.values.__getitem__, self.codes)
+
+    def append(self, value):
+        code = self.categories.encode(value)
+        if code >= 1 << (8 * self.codes.itemsize):
+            self.codes = array(self._typecode_for(code + 1), self.codes)
+        self.codes.append(code)
+
+    def extend(self, values):
+        for value in values:
+            self.append(value)
+
+    def eq(self, value):
+        """
+        Byte mask with a 1 for every row equal to value. Only the code of value
+        is looked up, the rows themselves are never turned back into strings
+        """
+        code = self.categories.lookup(value)
+        if code is None:
+            return bytes(len(self.codes))
+        # compare one byte lane of the codes at a time with bytes.translate
+        # (a 256 entry table mapping the wanted byte to 1), so the whole scan
+        # runs in C instead of a python-level compare per row
+        raw = self.codes.tobytes()
+        size = self.codes.itemsize
+        lanes = code.to_bytes(size, sys.byteorder)
+        return mask_and(
+            *(raw[i::size].translate(_hit_table[b]) for i, b in enumerate(lanes))
+        )
+
+    def isin(self, values):
+        """
+        Byte mask with a 1 for every row equal to any of values
+        """
+        return mask_or(bytes(len(self.codes)), *(self.eq(v) for v in values))
+
+    def __repr__(self):
+        return f"CategoricalColumn({list(self)!r})"
+
+
+# _hit_table[b] translates byte b to 1 and every other byte to 0
+_hit_table = [bytes(int(i == b) for i in range(256)) for b in range(256)]
+
+
+# masks are combined as big ints, which keeps the and/or in C as well
+def mask_and(*masks):
+    """
+    Combine byte masks so a row is kept only if every mask keeps it
+    """
+    bits = reduce(operator.and_, (int.from_bytes(m, "little") for m in masks))
+    return bits.to_bytes(len(masks[0]), "little")
+
+
+def mask_or(*masks):
+    """
+    Combine byte masks so a row is kept if any mask keeps it
+    """
+    bits = reduce(operator.or_, (int.from_bytes(m, "little") for m in masks))
+    return bits.to_bytes(len(masks[0]), "little")
+
+
+class ColumnView(Sequence):
+    """
+    Window onto another column. The rows it covers are kept as a range (which
+    already knows how to do offset, length and step), so no data is copied
+    """
+
+    def __init__(self, base, rows):
+        self.base = base
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, i):  # type: ignore
+        if isinstance(i, slice):
+            # slicing a range gives back a range, so views of views stay flat
+            return ColumnView(self.base, self.rows[i])
+        return self.base[self.rows[i]]
+
+    def copy(self):
+        """
+        Materialize the view as a column of the same type as its base
+        """
+        base = self.base
+        if isinstance(base, CategoricalColumn):
+            codes = base.codes
+            return CategoricalColumn(
+                array(codes.typecode, map(codes.__getitem__, self.rows)),
+                base.categories,
+            )
+        if isinstance(base, array):
+            return array(base.typecode, map(base.__getitem__, self.rows))
+        return [base[i] for i in self.rows]
+
+    # views are copy-on-write: the first append or extend detaches the view
+    # onto its own copy, so the base column is never changed through it
+    def append(self, value):
+        self._detach()
+        self.base.append(value)
+        self.rows = range(len(self.base))
+
+    def extend(self, values):
+        self._detach()
+        self.base.extend(values)
+        self.rows = range(len(self.base))
+
+    _owned = False
+
+    def _detach(self):
+        if not self._owned:
+            self.base = self.copy()
+            self.rows = range(len(self.base))
+            self._owned = True
+
+    # categorical filters run on a copy of just the windowed codes
+    def eq(self, value):
+        return self.copy().eq(value)
+
+    def isin(self, values):
+        return self.copy().isin(values)
+
+    def __repr__(self):
+        return f"ColumnView({list(self)!r})"
+
+
+def column_view(column, index):
+    """
+    Slice a column without copying it
+    """
+    if isinstance(column, ColumnView):
+        return column[index]
+    return ColumnView(column, range(len(column))[index])
+
+
+def column_copy(column):
+    """
+    Copy of a column, materializing it first if it's a view
+    """
+    if isinstance(column, ColumnView):
+        return column.copy()
+    return column[:]
+
+
+def make_column(type, categories=None):
+    """
+    Make an empty column suited to the given conversion function. String
+    columns can be handed an existing Categories table to share
+    """
+    if type in typecodes:
+        return array(typecodes[type])
+    if type is str:
+        return CategoricalColumn(categories=categories)
+    # anything else (Decimal, custom parsers...) stays a plain list of objects
+    return []
@@ -1,6 +1,10 @@
 import csv
 from collections.abc import Sequence
 
+import colcache
+import mmapscan
+from columns import column_copy, column_view, make_column
+
 
 class DataCollection(Sequence):
     def __init__(self, columns):
@@ -8,7 +12,10 @@ class DataCollection(Sequence):
 
     def __getitem__(self, index):  # type: ignore
         if isinstance(index, slice):
-            sliced_data = {key: value[index] for key, value in self.columns.items()}
+            # views share the parent's columns, use .copy() to get a standalone one
+            sliced_data = {
+                key: column_view(value, index) for key, value in self.columns.items()
+            }
             return DataCollection(sliced_data)
         elif isinstance(index, int):
             if index < 0 or index >= len(self):
@@ -22,25 +29,53 @@ class DataCollection(Sequence):
             return len(next(iter(self.columns.values())))
         return 0
 
+    def copy(self):
+        return DataCollection(
+            {key: column_copy(value) for key, value in self.columns.items()}
+        )
+
+
+def read_csv_as_columns(filename, types, *, cache=False, columns=None):
+    # with cache=True the parsed columns are kept in a binary sidecar file
+    # (see colcache.py) and later calls load that instead of parsing again
+    if cache:
+        cached = colcache.load(filename, types)
+        if cached is not None:
+            headers, data = cached
+            return DataCollection({h: data[h] for h in columns or headers})
+
+    # a projection only decodes and converts the columns asked for (see
+    # mmapscan.py). the cache always holds every column, so with cache=True
+    # the whole file is parsed and stored first
+    if columns is not None and not cache:
+        with open(filename) as file:
+            headers = next(csv.reader(file))
+        data = {name: make_column(types[headers.index(name)]) for name in columns}
+        appends = [column.append for column in data.values()]
+        for row in mmapscan.scan(filename, types, columns):
+            for append, value in zip(appends, row):
+                append(value)
+        return DataCollection(data)
 
-def read_csv_as_columns(filename, types):
     with open(filename, "r") as file:
         reader = csv.reader(file)
         headers = next(reader)  # Read the first row to use as column headers
 
-        # Initialize the dictionary with headers as keys
-        columns = {header: [] for header in headers}
+        # Initialize the dictionary with headers as keys, each column stored in
+        # the compact form that matches its type (arrays, dictionary-encoded strings)
+        data = {header: make_column(t) for header, t in zip(headers, types)}
 
         for row in reader:
             for i, value in enumerate(row):
                 try:
                     # Append the value to the appropriate column after type conversion
-                    columns[headers[i]].append(types[i](value))
+                    data[headers[i]].append(types[i](value))
                 except ValueError:
                     # Handle or log conversion error (optional)
                     print(
                         f"Warning: Conversion error for '{value}' in column '{headers[i]}'."
                     )
 
-    print(columns.items())
-    return DataCollection(columns)
+    if cache:
+        colcache.store(filename, types, headers, data)
+    return DataCollection({h: data[h] for h in columns or headers})
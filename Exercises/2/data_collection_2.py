@@ -1,6 +1,8 @@
 import collections
 import csv
 
+from columns import column_copy, column_view
+
 
 # Cool exercise as it shows the difference between the interal representation of data, and how it is
 # presented to its consumer / user
@@ -14,7 +16,6 @@ class DataCollection(collections.abc.Sequence):  # type: ignore
         # elif len(data.values()) != len(headers):
         #     raise TypeError("You must pass initial data for each header")
         else:
-            print(len(data), len(headers))
             for h, v in zip(headers, data):
                 setattr(self, h, v)
 
@@ -27,9 +28,9 @@ class DataCollection(collections.abc.Sequence):  # type: ignore
             # new object to return
             return {h: getattr(self, h)[i] for h in self.headers}
         elif isinstance(i, slice):
-            x = [[d] for h in self.headers for d in getattr(self, h)[i]]
-            print(x, "the x is")
-            return DataCollection(self.headers, x)
+            # each column of the slice is a view onto ours, nothing gets copied
+            views = [column_view(getattr(self, h), i) for h in self.headers]
+            return DataCollection(self.headers, views)
         else:
             raise TypeError("Invalid argument type.")
 
@@ -37,6 +38,11 @@ class DataCollection(collections.abc.Sequence):  # type: ignore
         for h in self.headers:
             return len(getattr(self, h, []))
 
+    def copy(self):
+        return DataCollection(
+            self.headers, [column_copy(getattr(self, h)) for h in self.headers]
+        )
+
     def append(self, d):
         for col in d.keys():
             getattr(self, col).append(d[col])
@@ -0,0 +1,180 @@
+import csv
+import gc
+import io
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from columns import make_column, typecodes
+from data_collection import DataCollection
+from reader import _dict_maker
+
+
+# split the file into byte ranges and then nudge every boundary forward to the
+# next newline, so each worker gets whole lines and no line is read twice.
+# (this assumes no quoted field contains a newline, which holds for the ride
+# and stock files)
+def chunk_ranges(filename, nchunks):
+    """
+    Return the header row and a list of (start, end) byte ranges for the body
+    """
+    size = os.path.getsize(filename)
+    with open(filename, "rb") as f:
+        headers = next(csv.reader([f.readline().decode()]))
+        body_start = f.tell()
+
+        boundaries = [body_start]
+        for i in range(1, nchunks):
+            pos = body_start + (size - body_start) * i // nchunks
+            if pos <= boundaries[-1]:
+                continue
+            f.seek(pos)
+            f.readline()  # finish off the line we landed in
+            pos = f.tell()
+            if pos >= size:
+                break
+            if pos > boundaries[-1]:
+                boundaries.append(pos)
+        boundaries.append(size)
+
+    return headers, list(zip(boundaries, boundaries[1:]))
+
+
+def _read_chunk(filename, start, end):
+    with open(filename, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    # newline="" leaves the line splitting to csv, exactly as when it reads the
+    # file itself (str.splitlines would also split on \x0c, \x1c, \u2028...)
+    return csv.reader(io.StringIO(data.decode(), newline=""))
+
+
+# workers send columns back rather than records: unpickling a million small
+# dicts or strings costs the parent more than the whole serial parse. each
+# column travels as (typecode, data, categories):
+#   int/float  the array's raw bytes, categories None
+#   str        the bytes of "I" codes into the chunk's own list of categories
+#   anything   typecode None and a plain list of converted values
+def _encode_column(func, values):
+    if func in typecodes:
+        typecode = typecodes[func]
+        return typecode, array(typecode, map(func, values)).tobytes(), None
+    if func is str:
+        categories = list(dict.fromkeys(values))
+        index = {v: i for i, v in enumerate(categories)}
+        return "I", array("I", map(index.__getitem__, values)).tobytes(), categories
+    return None, list(map(func, values)), None
+
+
+def _decode_column(column):
+    typecode, data, categories = column
+    if typecode is None:
+        return data
+    values = array(typecode)
+    values.frombytes(data)
+    if categories is None:
+        return values
+    return map(categories.__getitem__, values)
+
+
+# workers only get plain arguments, so the function has to live at module
+# level to be picklable
+def _parse_chunk(filename, start, end, headers, types, columns):
+    """
+    Return a chunk as a tuple of encoded columns. A chunk with short rows in
+    dicts mode comes back as a list of dicts instead, with the missing keys
+    left out like the serial reader does
+    """
+    # the chunk's rows are all held at once and none of them can be part of a
+    # reference cycle, so the collector would only rescan them over and over
+    gc.disable()
+    try:
+        rows = list(_read_chunk(filename, start, end))
+        width = len(headers)
+        if columns:
+            rows = [row for row in rows if row]  # blank lines hold no values
+        if any(len(row) < width for row in rows):
+            if columns:
+                raise ValueError(f"Row with fewer than {width} fields in {filename}")
+            return [{h: f(v) for h, f, v in zip(headers, types, row)} for row in rows]
+        values = list(zip(*rows)) or [()] * width
+        return tuple(_encode_column(f, col) for f, col in zip(types, values))
+    finally:
+        gc.enable()
+
+
+def _extend_categorical(column, typecode, data, categories):
+    """
+    Append a chunk's codes to a CategoricalColumn, translating them through a
+    table with one entry per chunk category instead of re-encoding every value
+    """
+    table = [column.categories.encode(v) for v in categories]
+    wanted = column._typecode_for(len(column.categories))
+    if wanted != column.codes.typecode:
+        column.codes = array(wanted, column.codes)
+    codes = np.asarray(table, dtype=wanted)[np.frombuffer(data, dtype=typecode)]
+    column.codes.frombytes(codes.tobytes())
+
+
+def read_csv_parallel(filename, types, *, columns=False, workers=None):
+    """
+    Parse a CSV file across a process pool. Returns a list of dicts, or a
+    DataCollection when columns=True. Records keep their original order.
+    The types get sent to the worker processes, so they must be picklable
+    """
+    workers = workers or os.cpu_count() or 1
+    # a few chunks per worker so one slow chunk doesn't leave the others idle
+    headers, ranges = chunk_ranges(filename, workers * 4)
+    if len(headers) != len(types):
+        raise ValueError(
+            f"Expected {len(headers)} conversion functions, got {len(types)}"
+        )
+
+    starts, ends = zip(*ranges) if ranges else ((), ())
+    n = len(ranges)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # map hands results back in submission order, i.e. file order
+        chunks = pool.map(
+            _parse_chunk,
+            [filename] * n,
+            starts,
+            ends,
+            [headers] * n,
+            [types] * n,
+            [columns] * n,
+        )
+        if not columns:
+            make = _dict_maker(headers)
+            records = []
+            for chunk in chunks:
+                if isinstance(chunk, list):
+                    records.extend(chunk)
+                else:
+                    records.extend(map(make, *map(_decode_column, chunk)))
+            return records
+
+        # the merge only copies blocks of bytes: numeric columns are appended
+        # as they are and string codes are remapped onto shared categories
+        data = {h: make_column(t) for h, t in zip(headers, types)}
+        for chunk in chunks:
+            for h, (typecode, block, categories) in zip(headers, chunk):
+                column = data[h]
+                if categories is not None:
+                    _extend_categorical(column, typecode, block, categories)
+                elif typecode is not None:
+                    column.frombytes(block)
+                else:
+                    column.extend(block)
+        return DataCollection(data)
+
+
+def read_rides_parallel(filename, *, columns=True, workers=None):
+    """
+    Read the bus ride data in parallel (columns by default)
+    """
+    return read_csv_parallel(
+        filename, [str, str, str, int], columns=columns, workers=workers
+    )
@@ -0,0 +1,210 @@
+from array import array
+
+import numpy as np
+
+from columns import CategoricalColumn, ColumnView
+
+
+# numpy understands the same typecodes as the array module, so typed columns
+# (and the codes of categorical ones) can be wrapped without copying. while a
+# wrapped array is alive its column can't grow, so these only ever live for
+# the duration of one query operation
+def as_numpy(column):
+    """
+    Return (values, categories) for a column. For categorical columns values
+    are the codes and categories is their Categories table, otherwise it's None
+    """
+    if isinstance(column, ColumnView):
+        values, categories = as_numpy(column.base)
+        rows = column.rows
+        if not rows:
+            return values[:0], categories
+        # a reversed range running down to index 0 has a stop of -1, which
+        # as a slice bound would mean the last row
+        stop = rows.stop if rows.stop >= 0 else None
+        return values[rows.start : stop : rows.step], categories
+    if isinstance(column, CategoricalColumn):
+        codes = column.codes
+        return np.frombuffer(codes, dtype=codes.typecode), column.categories
+    if isinstance(column, array):
+        return np.frombuffer(column, dtype=column.typecode), None
+    return np.asarray(column), None
+
+
+class Query:
+    """
+    Filters and aggregates over the columns of a DataCollection (or RideData),
+    run as whole-column numpy operations instead of a python loop per row
+    """
+
+    def __init__(self, columns, mask=None):
+        self.columns = columns
+        self.mask = mask
+
+    def _column(self, name):
+        return as_numpy(self.columns[name])
+
+    def _and(self, rows):
+        return Query(self.columns, rows if self.mask is None else self.mask & rows)
+
+    def where(self, **conditions):
+        """
+        Keep rows whose columns equal the given values. Categorical columns
+        compare a single code against the codes
+        """
+        query = self
+        for name, value in conditions.items():
+            values, categories = query._column(name)
+            if categories is None:
+                rows = values == value
+            else:
+                code = categories.lookup(value)
+                if code is None:
+                    rows = np.zeros(len(values), dtype=bool)
+                else:
+                    rows = values == code
+            query = query._and(rows)
+        return query
+
+    def filter(self, name, predicate):
+        """
+        Keep rows where predicate is true. For categorical columns predicate is
+        called once per distinct string, for the others it gets the whole
+        numpy column and should return a boolean array (e.g. lambda x: x > 0)
+        """
+        values, categories = self._column(name)
+        if categories is None:
+            return self._and(np.asarray(predicate(values), dtype=bool))
+        keep = np.fromiter(
+            map(predicate, categories.values), dtype=bool, count=len(categories)
+        )
+        return self._and(keep[values])
+
+    def derive(self, name, source, fn):
+        """
+        Add a categorical column computed from another one, e.g. the year out
+        of a date. fn only runs once per distinct value of source
+        """
+        codes, categories = self._column(source)
+        derived = CategoricalColumn()
+        mapping = np.fromiter(
+            map(derived.categories.encode, map(fn, categories.values)),
+            dtype=np.uint32,
+            count=len(categories),
+        )
+        derived.codes = array("I", mapping[codes].tobytes())
+        return Query({**self.columns, name: derived}, self.mask)
+
+    def _selected(self, name):
+        values, categories = self._column(name)
+        if self.mask is not None:
+            values = values[self.mask]
+        return values, categories
+
+    def count(self):
+        if self.mask is None:
+            return len(next(iter(self.columns.values()), ()))
+        return int(np.count_nonzero(self.mask))
+
+    def sum(self, name):
+        return self._selected(name)[0].sum().item()
+
+    def distinct(self, name):
+        values, categories = self._selected(name)
+        uniques = np.unique(values)
+        if categories is None:
+            return uniques.tolist()
+        return [categories.values[code] for code in uniques.tolist()]
+
+    def count_distinct(self, name):
+        values, categories = self._selected(name)
+        if categories is None:
+            return int(np.unique(values).size)
+        # codes are small ints, so counting them beats sorting
+        return int(np.count_nonzero(np.bincount(values, minlength=len(categories))))
+
+    def group_by(self, key):
+        return GroupBy(self, key)
+
+
+class GroupBy:
+    """
+    Rows of a query grouped by the codes of a categorical column
+    """
+
+    def __init__(self, query, key):
+        self.query = query
+        self.codes, self.categories = query._selected(key)
+        if self.categories is None:
+            raise TypeError(f"Can only group by a categorical column, not {key!r}")
+
+    def _totals(self, weights):
+        ngroups = len(self.categories)
+        present = np.bincount(self.codes, minlength=ngroups) > 0
+        totals = np.zeros(ngroups, dtype=weights.dtype)
+        np.add.at(totals, self.codes, weights)
+        # the row each group is first seen in, to break ties the way a
+        # Counter filled row by row does
+        mask = self.query.mask
+        rows = np.arange(len(self.codes)) if mask is None else np.flatnonzero(mask)
+        first = np.full(ngroups, np.iinfo(np.int64).max, dtype=np.int64)
+        np.minimum.at(first, self.codes, rows)
+        return GroupTotals(self.categories, totals, present, first)
+
+    def sum(self, name):
+        return self._totals(self.query._selected(name)[0])
+
+    def count(self):
+        return self._totals(np.ones(len(self.codes), dtype=np.int64))
+
+
+class GroupTotals:
+    """
+    One total per group, kept as an array indexed by the group's code
+    """
+
+    def __init__(self, categories, totals, present, first):
+        self.categories = categories
+        self.totals = totals
+        self.present = present
+        self.first = first
+
+    def __sub__(self, other):
+        if other.categories is not self.categories:
+            return NotImplemented
+        return GroupTotals(
+            self.categories,
+            self.totals - other.totals,
+            self.present | other.present,
+            np.minimum(self.first, other.first),
+        )
+
+    def to_dict(self):
+        codes = np.flatnonzero(self.present)
+        keys = [self.categories.values[c] for c in codes.tolist()]
+        return dict(zip(keys, self.totals[codes].tolist()))
+
+    def top_k(self, k):
+        """
+        The k largest (group, total) pairs, largest first. Equal totals come
+        in the order their groups were first seen, like Counter.most_common
+        """
+        codes = np.flatnonzero(self.present)
+        totals = self.totals[codes]
+        if 0 < k < len(codes):
+            # only fully sort the k winners, plus anything tied with the last
+            kth = np.partition(totals, len(totals) - k)[len(totals) - k]
+            best = np.flatnonzero(totals >= kth)
+            codes, totals = codes[best], totals[best]
+        order = np.lexsort((self.first[codes], -totals))[: max(k, 0)]
+        return [
+            (self.categories.values[c], t)
+            for c, t in zip(codes[order].tolist(), totals[order].tolist())
+        ]
+
+
+def query(data):
+    """
+    Start a query over a DataCollection, RideData or a dict of columns
+    """
+    return Query(getattr(data, "columns", data))
@@ -2,7 +2,7 @@
 import csv
 from collections.abc import Sequence
 
-from soln2_1 import read_as_dict
+from columns import CategoricalColumn, column_copy, column_view, make_column
 
 
 class RideData(Sequence):
@@ -13,23 +13,34 @@ class RideData(Sequence):
         daytypes=None,
         numrides=None,
     ) -> None:
-        self.routes = routes if routes is not None else []
-        self.dates = dates if dates is not None else []
-        self.daytypes = daytypes if daytypes is not None else []
-        self.numrides = numrides if numrides is not None else []
+        self.routes = routes if routes is not None else CategoricalColumn()
+        self.dates = dates if dates is not None else CategoricalColumn()
+        self.daytypes = daytypes if daytypes is not None else CategoricalColumn()
+        self.numrides = numrides if numrides is not None else make_column(int)
 
     def __len__(self) -> int:
         return len(self.routes)
 
+    # same names as the keys of the row dicts, so RideData can be queried like a
+    # DataCollection (see query.py)
+    @property
+    def columns(self):
+        return {
+            "route": self.routes,
+            "date": self.dates,
+            "daytype": self.daytypes,
+            "rides": self.numrides,
+        }
+
     def __getitem__(self, index):  # type: ignore
         if isinstance(index, slice):
-            print("The index and slice are:", index, slice)
-            # Handle slice case: return a new RideData object with sliced data
+            # Handle slice case: return a new RideData object viewing the same
+            # columns (nothing is copied until .copy() is called)
             return RideData(
-                routes=self.routes[index],
-                dates=self.dates[index],
-                daytypes=self.daytypes[index],
-                numrides=self.numrides[index],
+                routes=column_view(self.routes, index),
+                dates=column_view(self.dates, index),
+                daytypes=column_view(self.daytypes, index),
+                numrides=column_view(self.numrides, index),
             )
         elif isinstance(index, int):
             # Handle single item access: return a dictionary for the row
@@ -44,6 +55,14 @@ class RideData(Sequence):
         else:
             raise TypeError("Invalid argument type.")
 
+    def copy(self):
+        return RideData(
+            routes=column_copy(self.routes),
+            dates=column_copy(self.dates),
+            daytypes=column_copy(self.daytypes),
+            numrides=column_copy(self.numrides),
+        )
+
     def append(self, d):
         self.routes.append(d["route"])
         self.dates.append(d["date"])
@@ -89,10 +108,10 @@ def read_rides_as_columns(filename):
     """
     Read the bus ride data into 4 lists, representing columns
     """
-    routes = []
-    dates = []
-    daytypes = []
-    numrides = []
+    routes = CategoricalColumn()
+    dates = CategoricalColumn()
+    daytypes = CategoricalColumn()
+    numrides = make_column(int)
     with open(filename) as f:
         rows = csv.reader(f)
         next(rows)  # Skip headers
@@ -1,7 +1,40 @@
 import csv
+from itertools import starmap
 
+import colcache
+import mmapscan
+from data_collection import read_csv_as_columns
+
+
+# builds def make(c0, c1, ...): return {"name": c0, ...} so that map can zip the
+# columns back into dicts without a python-level loop
+def _dict_maker(headers):
+    args = ", ".join(f"c{i}" for i in range(len(headers)))
+    body = ", ".join(f"{h!r}: c{i}" for i, h in enumerate(headers))
+    env = {}
+    exec(f"def make({args}):\n    return {{{body}}}\n", env)
+    return env["make"]
+
+
+def read_csv_as_dicts(filename, conv, *, cache=False, columns=None):
+    # the cache holds columns, turning those back into dicts is still much
+    # cheaper than parsing and converting every field again
+    # types the cache can't hold (Decimal, ...) go straight to the normal parse
+    if cache and colcache._key(filename, conv) is not None:
+        cached = colcache.load(filename, conv)
+        if cached is None:
+            data = read_csv_as_columns(filename, conv, cache=True).columns
+            headers = list(data)
+        else:
+            headers, data = cached
+        headers = columns or headers
+        return list(map(_dict_maker(headers), *(data[h] for h in headers)))
+
+    # a projection only decodes and converts the columns asked for (see mmapscan.py)
+    if columns is not None:
+        rows = mmapscan.scan(filename, conv, columns)
+        return list(starmap(_dict_maker(columns), rows))
 
-def read_csv_as_dicts(filename, conv):
     with open(filename) as f:
         rows = csv.reader(f)
         headers = next(rows)
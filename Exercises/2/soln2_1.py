@@ -5,6 +5,8 @@ from collections import namedtuple
 
 import matplotlib.pyplot as plt
 
+from columns import make_column
+
 
 # these need to return all of the data in the given representation
 def read_as_tuple(route, date, daytype, rides):
@@ -89,6 +91,28 @@ def process_rows(rows, fn):
     return items
 
 
+RIDE_TYPES = [str, str, str, int]
+
+# the column reps keep one container per column instead of one object per row,
+# and (unlike the row reps above) store rides converted to an int
+column_reps = {
+    "list_columns": {"make": lambda: [[] for _ in RIDE_TYPES], "memory": 0},
+    "typed_columns": {
+        "make": lambda: [make_column(t) for t in RIDE_TYPES],
+        "memory": 0,
+    },
+}
+
+
+@track_memory
+def process_columns(rows, columns):
+    _ = next(rows)
+    for row in rows:
+        for col, func, val in zip(columns, RIDE_TYPES, row):
+            col.append(func(val))
+    return columns
+
+
 # read in the file, process according to each rep, and then reset the file
 # pointer until the end of the file is reached and all representations are read
 
@@ -102,6 +126,12 @@ def read_all_reps(filename):
             _, p = process_rows(rows, data_reps[rep]["fn"])
             data_reps[rep]["memory"] = p
 
+        for rep in column_reps:
+            f.seek(0)
+            rows = csv.reader(f)
+            _, p = process_columns(rows, column_reps[rep]["make"]())
+            column_reps[rep]["memory"] = p
+
 
 def draw_results(sorted_rep):
     # Extract data types and memory usage from sorted_rep
@@ -132,7 +162,8 @@ def draw_results(sorted_rep):
 
 if __name__ == "__main__":
     read_all_reps("../../Data/ctabus.csv")
-    sorted_rep = sorted(data_reps.items(), key=lambda x: x[1]["memory"])
+    all_reps = {**data_reps, **column_reps}
+    sorted_rep = sorted(all_reps.items(), key=lambda x: x[1]["memory"])
     for rep, data in sorted_rep:
         print(f"{rep}: {data['memory']/1000000:.2f} MB")
     print("\nDrawing graph...\n")
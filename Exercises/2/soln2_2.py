@@ -1,6 +1,8 @@
 import csv
 from collections import Counter, defaultdict
 
+from query import query
+
 FILE = "../../Data/ctabus.csv"
 GREATEST_INC_SELECTION = 5
 
@@ -16,67 +18,140 @@ def read_file(fn):
     return wrapper
 
 
-@read_file
-def get_number_of_rides(rows=[]):
-    # Directly operate on rows and return the result
-    return len({row[0] for row in rows})
+# each question is an aggregation that gets fed one row at a time, so any mix of
+# them can share a single pass over the file (see run_report)
+class DistinctRoutes:
+    def __init__(self):
+        self.routes = set()
 
+    def add(self, row):
+        self.routes.add(row[0])
 
-@read_file
-def get_bus_rides_on_optional_date(rows, bus_num, date=None):
-    # Directly operate on rows and return the result
-    # Fixed to filter correctly and sum up the 'rides' as integers
-    return sum(
-        int(r[-1])
-        for r in rows
-        if r[0] == str(bus_num) and (date is None or r[1] == date)
-    )
+    def result(self):
+        return len(self.routes)
 
 
-@read_file
-def total_num_of_rides(rows=[]):
-    num_rides = defaultdict(int)
-    for r in rows:
-        num_rides[r[0]] += int(r[3])
-    return dict(num_rides)
+class BusRides:
+    def __init__(self, bus_num, date=None):
+        self.bus_num = str(bus_num)
+        self.date = date
+        self.total = 0
+
+    def add(self, row):
+        if row[0] == self.bus_num and (self.date is None or row[1] == self.date):
+            self.total += int(row[-1])
+
+    def result(self):
+        return self.total
+
+
+class RouteTotals:
+    def __init__(self):
+        self.num_rides = defaultdict(int)
+
+    def add(self, row):
+        self.num_rides[row[0]] += int(row[3])
+
+    def result(self):
+        return dict(self.num_rides)
 
 
 yr_set = {"2001", "2011"}
 
 
 # could probably do something where one direction is positive and the other is negative
-@read_file
-def get_greatest_ten_yr_increase(rows=[], selections=5):
-    total_diff = Counter()
-
-    # two_one = Counter()
-    # two_elevent = Counter()
+class GreatestIncrease:
+    def __init__(self, selections=5):
+        self.selections = selections
+        self.total_diff = Counter()
 
-    for row in rows:
+    def add(self, row):
         year = row[1].split("/")[-1]
         if year in yr_set:
-            # if year == "2001":
-            #     total_one[row[0]] += int(row[-1])
-            # else:
-            #     two_eleven[row[0]] += int(row[-1])
-
-            # alternative way to calculate
+            # alternative way to calculate: 2001 counts down and 2011 counts up,
+            # so what's left is the increase
             if year == "2001":
-                total_diff[row[0]] -= int(row[-1])
+                self.total_diff[row[0]] -= int(row[-1])
             else:
-                total_diff[row[0]] += int(row[-1])
+                self.total_diff[row[0]] += int(row[-1])
 
-    # print(total_diff, two_eleven)
-    # diff = two_eleven - total_diff
+    def result(self):
+        return self.total_diff.most_common(self.selections)
+
+
+@read_file
+def run_report(rows, aggregations):
+    """
+    Feed every row to each of the named aggregations in one pass over the file
+    and return their results by name
+    """
+    adds = [agg.add for agg in aggregations.values()]
+    for row in rows:
+        for add in adds:
+            add(row)
+    return {name: agg.result() for name, agg in aggregations.items()}
 
-    return total_diff.most_common(selections)
+
+def _single(agg):
+    return run_report({"result": agg})["result"]
+
+
+def get_number_of_rides():
+    return _single(DistinctRoutes())
+
+
+def get_bus_rides_on_optional_date(bus_num, date=None):
+    return _single(BusRides(bus_num, date))
+
+
+def total_num_of_rides():
+    return _single(RouteTotals())
+
+
+def get_greatest_ten_yr_increase(selections=5):
+    return _single(GreatestIncrease(selections))
+
+
+# the same four questions answered with query.py over ride data that has been
+# loaded once into columns, e.g. read_rides.read_rides_as_dicts(FILE) or
+# data_collection.read_csv_as_columns(FILE, [str, str, str, int]). the route
+# and date filters compare categorical codes instead of strings
+def get_number_of_rides_columns(rides):
+    return query(rides).count_distinct("route")
+
+
+def get_bus_rides_on_optional_date_columns(rides, bus_num, date=None):
+    q = query(rides).where(route=str(bus_num))
+    if date is not None:
+        q = q.where(date=date)
+    return q.sum("rides")
+
+
+def total_num_of_rides_columns(rides):
+    return query(rides).group_by("route").sum("rides").to_dict()
+
+
+def get_greatest_ten_yr_increase_columns(rides, selections=5):
+    q = query(rides).derive("year", "date", lambda d: d.split("/")[-1])
+    later = q.where(year="2011").group_by("route").sum("rides")
+    earlier = q.where(year="2001").group_by("route").sum("rides")
+    return (later - earlier).top_k(selections)
 
 
 if __name__ == "__main__":
-    number_of_rides = get_number_of_rides()
-    bus_rides = get_bus_rides_on_optional_date("22", "02/02/2011")
-    total_rides_per = total_num_of_rides()
-    greatest_ten_yr_increase = get_greatest_ten_yr_increase(GREATEST_INC_SELECTION)
+    # one pass over the file for the whole report
+    report = run_report(
+        {
+            "number_of_rides": DistinctRoutes(),
+            "bus_rides": BusRides("22", "02/02/2011"),
+            "total_rides_per": RouteTotals(),
+            "greatest_ten_yr_increase": GreatestIncrease(GREATEST_INC_SELECTION),
+        }
+    )
+    number_of_rides = report["number_of_rides"]
+    bus_rides = report["bus_rides"]
+    total_rides_per = report["total_rides_per"]
+    greatest_ten_yr_increase = report["greatest_ten_yr_increase"]
 
     final_str = f"Total number of rides: {number_of_rides}\n\
         Bus rides on 22: {bus_rides}\n\
@@ -0,0 +1,217 @@
+# benchmarks for the table formatters, run from this directory:
+#   python bench_formatters.py
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+from array import array
+
+import reader
+import soln3_1
+from soln3_1 import Stock
+
+NROWS = 1_000_000
+FIELDS = ["name", "shares", "price"]
+
+
+def make_portfolio(nrows):
+    rand = random.Random(nrows)
+    names = ["AA", "IBM", "CAT", "MSFT", "GE", "HPQ", "XOM"]
+    return [
+        Stock(
+            rand.choice(names), rand.randint(1, 1000), round(rand.uniform(10, 200), 2)
+        )
+        for _ in range(nrows)
+    ]
+
+
+# how the formatters used to write: print() once per row to sys.stdout
+class PrintTextTableFormatter(soln3_1.TextTableFormatter):
+    def headings(self, headers):
+        print(" ".join("%10s" % h for h in headers))
+        print(("-" * 10 + " ") * len(headers))
+
+    def row(self, rowdata):
+        print(" ".join("%10s" % d for d in rowdata))
+
+    def format_rows(self, rows):
+        for rowdata in rows:
+            self.row(rowdata)
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def bench_text_report(nrows=NROWS):
+    portfolio = make_portfolio(nrows)
+    with tempfile.TemporaryDirectory() as d:
+        filename = os.path.join(d, "report.txt")
+
+        with open(filename, "w") as f:
+            stdout = sys.stdout
+            sys.stdout = f
+            try:
+                old = _timed(
+                    soln3_1.print_table, portfolio, FIELDS, PrintTextTableFormatter()
+                )
+            finally:
+                sys.stdout = stdout
+        with open(filename) as f:
+            expected = f.read()
+
+        with open(filename, "w") as f:
+            new = _timed(
+                soln3_1.print_table,
+                portfolio,
+                FIELDS,
+                soln3_1.create_formatter("text", f),
+            )
+        with open(filename) as f:
+            assert f.read() == expected
+
+        # the floor: just the getattr calls print_table has to make anyway
+        extract = _timed(
+            lambda: [[getattr(r, name) for name in FIELDS] for r in portfolio]
+        )
+
+    print(f"text report, {nrows} rows")
+    print(f"  print() per row       {old:.2f}s")
+    print(f"  format_rows to file   {new:.2f}s ({old / new:.1f}x)")
+    print(f"  field extraction only {extract:.2f}s")
+
+
+# print_table_with_formats before format plans: a % and a zip step per cell
+def print_table_with_formats_zip(records, fields, formats, formatter):
+    formatter.headings(fields)
+    formatter.format_rows(
+        [f % getattr(r, fieldname) for f, fieldname in zip(formats, fields)]
+        for r in records
+    )
+
+
+class Null:
+    def write(self, text):
+        pass
+
+
+def bench_format_plans(nrows=NROWS):
+    portfolio = make_portfolio(nrows)
+    formats = ['"%s"', "%d", "%0.2f"]
+    old = _timed(
+        print_table_with_formats_zip,
+        portfolio,
+        FIELDS,
+        formats,
+        soln3_1.create_formatter("csv", Null()),
+    )
+    new = _timed(
+        reader.print_table_with_formats,
+        portfolio,
+        FIELDS,
+        formats,
+        soln3_1.create_formatter("csv", Null()),
+    )
+    print(f"formatted csv report, {nrows} rows")
+    print(f"  per-cell formats      {old:.2f}s")
+    print(f"  format plan           {new:.2f}s ({old / new:.1f}x)")
+
+    # lots of small reports, each asking for a formatter
+    small = portfolio[:10]
+    calls = 10_000
+    start = time.perf_counter()
+    for _ in range(calls):
+        f = reader.create_formatter_with_mixins(
+            "text", column_formats=formats, upper_headers=True, out=Null()
+        )
+        soln3_1.print_table(small, FIELDS, f)
+    elapsed = time.perf_counter() - start
+    print(f"  {calls} 10-row reports with mixins {elapsed:.2f}s")
+
+
+def bench_multi_sink(nrows=NROWS):
+    portfolio = make_portfolio(nrows)
+    types = ["text", "csv", "html"]
+    with tempfile.TemporaryDirectory() as d:
+        names = [os.path.join(d, f"report.{t}") for t in types]
+
+        start = time.perf_counter()
+        for t, name in zip(types, names):
+            with open(name, "w") as f:
+                soln3_1.print_table(portfolio, FIELDS, soln3_1.create_formatter(t, f))
+        separate = time.perf_counter() - start
+        expected = []
+        for name in names:
+            with open(name) as f:
+                expected.append(f.read())
+
+        timings = []
+        for threads in (False, True):
+            files = [open(name, "w") for name in names]
+            formatters = [soln3_1.create_formatter(t, f) for t, f in zip(types, files)]
+            start = time.perf_counter()
+            soln3_1.print_tables(portfolio, FIELDS, formatters, threads=threads)
+            for f in files:
+                f.close()
+            timings.append(time.perf_counter() - start)
+            for name, text in zip(names, expected):
+                with open(name) as f:
+                    assert f.read() == text
+
+    print(f"text+csv+html reports, {nrows} rows")
+    print(f"  three print_table passes {separate:.2f}s")
+    print(
+        f"  print_tables             {timings[0]:.2f}s ({separate / timings[0]:.1f}x)"
+    )
+    print(
+        f"  print_tables, threads    {timings[1]:.2f}s ({separate / timings[1]:.1f}x)"
+    )
+
+
+# export a million rows of columns and read them back in: csv against the
+# columnar format
+def bench_columnar(nrows=NROWS):
+    rand = random.Random(nrows)
+    names = ["AA", "IBM", "CAT", "MSFT", "GE", "HPQ", "XOM"]
+    columns = {
+        "name": [rand.choice(names) for _ in range(nrows)],
+        "shares": array("q", (rand.randint(1, 1000) for _ in range(nrows))),
+        "price": array("d", (round(rand.uniform(10, 200), 2) for _ in range(nrows))),
+    }
+    with tempfile.TemporaryDirectory() as d:
+        filename = os.path.join(d, "export")
+
+        start = time.perf_counter()
+        with open(filename, "w") as f:
+            formatter = soln3_1.create_formatter("csv", f)
+            formatter.headings(list(columns))
+            formatter.format_rows(zip(*columns.values()))
+        with open(filename) as f:
+            rows = csv.reader(f)
+            next(rows)
+            total = sum(float(price) for _, _, price in rows)
+        csv_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with open(filename, "wb") as f:
+            soln3_1.create_formatter("columnar", f).write_columns(columns)
+        (batch,) = soln3_1.load_columnar(filename)
+        assert sum(batch["price"]) == total
+        columnar_time = time.perf_counter() - start
+        del batch
+
+    print(f"export and reimport, {nrows} rows")
+    print(f"  csv                   {csv_time:.2f}s")
+    speedup = csv_time / columnar_time
+    print(f"  columnar              {columnar_time:.2f}s ({speedup:.1f}x)")
+
+
+if __name__ == "__main__":
+    bench_text_report()
+    bench_format_plans()
+    bench_multi_sink()
+    bench_columnar()
@@ -1,30 +1,117 @@
 import csv
+import functools
 from abc import ABC, abstractmethod
 
-from soln3_1 import TableFormatter, str_to_formatter_map
+from soln3_1 import TableFormatter, field_getter, str_to_formatter_map, write_table
+
+
+def make_row_converter(headers, types, target=dict):
+    """
+    Get the compiled row converter for a (headers, types, target) schema
+    """
+    return _compile_row_converter(
+        tuple(headers) if headers is not None else None, tuple(types), target
+    )
+
+
+# same trick namedtuple uses: write the source for one straight-line function
+# per schema and exec it, so converting a row doesn't re-zip anything
+@functools.lru_cache(maxsize=None)
+def _compile_row_converter(headers, types, target):
+    env = {"target": target}
+    args = []
+    for i, func in enumerate(types):
+        # csv already hands back strings, so skip the call entirely for str
+        if func is str:
+            args.append(f"row[{i}]")
+        else:
+            env[f"f{i}"] = func
+            args.append(f"f{i}(row[{i}])")
+
+    if target is dict:
+        body = "{" + ", ".join(f"{h!r}: {a}" for h, a in zip(headers, args)) + "}"
+    else:
+        body = "target(" + ", ".join(args) + ")"
+
+    # rows shorter than the schema (a blank line comes back as []) go through
+    # the zip-based conversion, which stops at the end of the row
+    def short(row):
+        if target is dict:
+            return {h: f(v) for h, f, v in zip(headers, types, row)}
+        return target(*[f(v) for f, v in zip(types, row)])
+
+    env["short"] = short
+    exec(
+        f"def convert(row):\n"
+        f"    if len(row) < {len(types)}:\n"
+        f"        return short(row)\n"
+        f"    return {body}\n",
+        env,
+    )
+    return env["convert"]
 
 
 def read_instance_from_row(cls):
     @classmethod
     def from_row(cls, row):
         # say class and not the instance, between types is on the class itself
-        # and not an instance
-        values = [f(v) for f, v in zip(cls._types, row)]
-        return cls(*values)
+        # and not an instance. the converter is compiled the first time a class
+        # is used (subclasses get their own) and stashed on the class
+        convert = cls.__dict__.get("_row_converter")
+        if convert is None:
+            convert = make_row_converter(None, cls._types, cls)
+            cls._row_converter = convert
+        return convert(row)
 
     cls.from_row = from_row
     return cls
 
 
-def print_table_with_formats(records, fields, formats, formatter):
+# any character that won't turn up in formatted values works as a separator.
+# if one ever does, the split gives the wrong number of cells and that row
+# is formatted cell by cell instead
+_SEP = "\x1f"
+
+
+def compile_format_plan(fields, formats):
+    """
+    Get the cached function turning a record into its list of formatted
+    cells. With fields=None it takes a sequence of already extracted values
+    """
+    return _compile_format_plan(
+        tuple(fields) if fields is not None else None, tuple(formats)
+    )
+
+
+# one % with all the formats joined into a single string does every cell of
+# a row at once, and an attrgetter pulls all the fields in one call
+@functools.lru_cache(maxsize=None)
+def _compile_format_plan(fields, formats):
+    joined = _SEP.join(formats)
+    ncells = len(formats)
+
+    def slow(values):
+        return [fmt % v for fmt, v in zip(formats, values)]
+
+    def plan_values(values):
+        cells = (joined % tuple(values)).split(_SEP)
+        return cells if len(cells) == ncells else slow(values)
+
+    if fields is None:
+        return plan_values
+
+    get = field_getter(fields)
+    return lambda record: plan_values(get(record))
+
+
+def print_table_with_formats(records, fields, formats, formatter, sample=0):
     # no guarantee this works even if it inherits from the proper base blass
     if not issubclass(type(formatter), TableFormatter):
         raise TypeError("Expected a table formatter")
 
-    formatter.headings(fields)
-    for r in records:
-        rowdata = [f % getattr(r, fieldname) for f, fieldname in zip(formats, fields)]
-        formatter.row(rowdata)
+    write_table(
+        formatter, fields, map(compile_format_plan(fields, formats), records), sample
+    )
 
 
 @read_instance_from_row
@@ -117,9 +204,16 @@ class CSVParser(ABC):
 class DictCSVParser(CSVParser):
     def __init__(self, types):
         self.types = types
+        self._headers = None
+        self._convert = None
 
     def make_record(self, headers, row):  # type: ignore
-        return {name: func(val) for name, func, val in zip(headers, self.types, row)}
+        # parse hands us the same headers list for every row of a file, so only
+        # look the converter up again when that changes
+        if headers is not self._headers:
+            self._headers = headers
+            self._convert = make_row_converter(headers, self.types)
+        return self._convert(row)
 
 
 class InstanceCSVParser(CSVParser):
@@ -144,29 +238,54 @@ def read_csv_as_dicts(file, types):
 class ColumnFormatMixin:
     formats = []
 
-    def row(self, rowdata):
-        rowdata = [(fmt % d) for fmt, d in zip(self.formats, rowdata)]
-        super().row(rowdata)  # type: ignore
+    # hooking format_row rather than row covers format_rows too
+    def format_row(self, rowdata):
+        return super().format_row(self._format_plan()(rowdata))  # type: ignore
+
+    def fit_widths(self, headers, rows):
+        plan = self._format_plan()
+        super().fit_widths(headers, [plan(rowdata) for rowdata in rows])  # type: ignore
+
+    def _format_plan(self):
+        # formats normally sit on the class, so the plan is looked up once
+        # per formatter rather than once per row
+        try:
+            return self._plan
+        except AttributeError:
+            self._plan = compile_format_plan(None, self.formats)
+            return self._plan
 
 
 class UpperHeadersMixin:
-    def headings(self, headers):
-        super().headings([h.upper() for h in headers])  # type: ignore
+    def format_headings(self, headers):
+        return super().format_headings([h.upper() for h in headers])  # type: ignore
 
 
-def create_formatter_with_mixins(type, column_formats=None, upper_headers=False):
+def create_formatter_with_mixins(
+    type, column_formats=None, upper_headers=False, out=None
+):
     if type not in str_to_formatter_map:
         RuntimeError("Please provide a valid key: 'html', 'csv', or 'html'")
+    formatter_cls = _formatter_class(
+        type, tuple(column_formats) if column_formats else None, upper_headers
+    )
+    return formatter_cls(out)
+
+
+# the same options always get the same class, so reports don't pay for
+# building classes (and their method resolution) on every call
+@functools.lru_cache(maxsize=None)
+def _formatter_class(type, column_formats, upper_headers):
     formatter_cls = str_to_formatter_map[type]
 
     if column_formats:
 
         class formatter_cls(ColumnFormatMixin, formatter_cls):
-            formats = column_formats
+            formats = list(column_formats)
 
     if upper_headers:
 
         class formatter_cls(UpperHeadersMixin, formatter_cls):
             pass
 
-    return formatter_cls()
+    return formatter_cls
@@ -1,7 +1,16 @@
 import csv
+import functools
+import json
+import mmap
+import struct
 import sys
 from abc import ABC, abstractmethod
+from array import array
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
+from itertools import accumulate, chain, islice
+from operator import attrgetter
 
 COL_LEN = 10
 
@@ -152,74 +161,481 @@ def printer(fns, v, headers):
 
 def print_portfolio(p, headers=None):
     fns = [_print_headers, _print_seps, _print_portfolio]
-    printer(fns, p, headers)
-
-
-def print_table(records, fields, formatter):
+    # only the rows pass goes over p, so any iterator works as long as the
+    # headers don't have to come from p[0]. if they do, peek at the first
+    # record and put it back in front
+    p = iter(p)
+    first = next(p, None)
+    if first is None:
+        return
+    if not headers:
+        headers = vars(first).keys()
+    printer(fns, chain([first], p), headers)
+
+
+def print_table(records, fields, formatter, sample=0):
     # no guarantee this works even if it inherits from the proper base blass
     if not issubclass(type(formatter), TableFormatter):
         raise TypeError("Expected a table formatter")
 
-    formatter.headings(fields)
-    for r in records:
-        rowdata = [getattr(r, fieldname) for fieldname in fields]
-        formatter.row(rowdata)
+    write_table(formatter, fields, map(field_getter(fields), records), sample)
+
+
+def field_getter(fields):
+    """
+    Return a function that pulls the fields off a record as a tuple
+    """
+    if not fields:
+        return lambda record: ()
+    get = attrgetter(*fields)
+    if len(fields) == 1:
+        # attrgetter hands back a bare value for a single field
+        return lambda record: (get(record),)
+    return get
+
+
+def print_tables(records, fields, formatters, sample=0, threads=False, batch_size=1000):
+    """
+    Render the same records with several formatters in one pass. Each
+    record's fields are pulled out once and every formatter gets the same
+    batches of rows. With threads=True every formatter writes from its own
+    thread, which pays off when they write to separate files
+    """
+    for formatter in formatters:
+        if not issubclass(type(formatter), TableFormatter):
+            raise TypeError("Expected a table formatter")
+    if not formatters:
+        return
+
+    rows = map(field_getter(fields), records)
+    if sample:
+        head = list(islice(rows, sample))
+        for formatter in formatters:
+            formatter.fit_widths(fields, head)
+        rows = chain(head, rows)
+    for formatter in formatters:
+        formatter.headings(fields)
+
+    batches = iter(lambda: list(islice(rows, batch_size)), [])
+    if not threads:
+        for batch in batches:
+            for formatter in formatters:
+                formatter.format_rows(batch)
+        return
+
+    with ThreadPoolExecutor(max_workers=len(formatters)) as pool:
+        for batch in batches:
+            # every sink finishes a batch before the next one goes out, so
+            # rows stay in order and only one batch is ever held
+            list(pool.map(lambda formatter: formatter.format_rows(batch), formatters))
+
+
+def write_table(formatter, headers, rows, sample=0):
+    """
+    Render rows in a single pass over any iterable. With sample, the first
+    sample rows are held back to size the columns before anything is written,
+    so memory stays bounded however many rows follow. For live sources, a
+    formatter.batch_size of 1 writes each row as soon as it arrives
+    """
+    rows = iter(rows)
+    if sample:
+        head = list(islice(rows, sample))
+        formatter.fit_widths(headers, head)
+        rows = chain(head, rows)
+    formatter.headings(headers)
+    formatter.format_rows(rows)
 
 
 class TableFormatter(ABC):
+    # format_rows() joins this many rows into a single write
+    batch_size = 1000
+
+    # out is any object with a write method. left as None, output goes to
+    # whatever sys.stdout is at the time of writing
+    def __init__(self, out=None):
+        self.out = out
+
     @abstractmethod
-    def headings(self, headers):
+    def format_headings(self, headers):
+        """
+        Return the heading line(s) as one string, newlines included
+        """
         raise NotImplementedError()
 
     @abstractmethod
-    def row(self, rowdata):
+    def format_row(self, rowdata):
+        """
+        Return one row as a string, newline included
+        """
         raise NotImplementedError()
 
+    def write(self, text):
+        (self.out if self.out is not None else sys.stdout).write(text)
+
+    def fit_widths(self, headers, rows):
+        """
+        Size the columns from a sample of rows. Formats without column
+        widths ignore it
+        """
 
-class TextTableFormatter(TableFormatter):
     def headings(self, headers):
-        print(" ".join("%10s" % h for h in headers))
-        print(("-" * 10 + " ") * len(headers))
+        self.write(self.format_headings(headers))
 
     def row(self, rowdata):
-        print(" ".join("%10s" % d for d in rowdata))
+        self.write(self.format_row(rowdata))
+
+    def format_rows(self, rows):
+        """
+        Write many rows, batch_size rows per write call
+        """
+        rows = iter(rows)
+        format_row = self.format_row
+        while True:
+            chunk = "".join(map(format_row, islice(rows, self.batch_size)))
+            if not chunk:
+                break
+            self.write(chunk)
+
+
+# the whole row is rendered with one % on a format string joined up once per
+# column count, instead of a % and a join per cell
+@functools.lru_cache(maxsize=None)
+def _row_format(cell, sep, ncols, prefix="", suffix=""):
+    return prefix + sep.join([cell] * ncols) + suffix + "\n"
+
+
+@functools.lru_cache(maxsize=None)
+def _width_format(widths):
+    return " ".join("%%%ds" % w for w in widths) + "\n"
+
+
+class TextTableFormatter(TableFormatter):
+    # every column is 10 wide unless widths are given or fitted. values that
+    # turn up wider than their column later on just push the row out
+    def __init__(self, out=None, widths=None):
+        super().__init__(out)
+        self.widths = widths
+
+    def fit_widths(self, headers, rows):
+        widths = [len(str(h)) for h in headers]
+        for rowdata in rows:
+            widths = [max(w, len(str(d))) for w, d in zip(widths, rowdata)]
+        self.widths = widths
+
+    def format_headings(self, headers):
+        if self.widths is None:
+            return (
+                " ".join("%10s" % h for h in headers)
+                + "\n"
+                + ("-" * 10 + " ") * len(headers)
+                + "\n"
+            )
+        return (
+            " ".join("%*s" % (w, h) for w, h in zip(self.widths, headers))
+            + "\n"
+            + "".join("-" * w + " " for w in self.widths)
+            + "\n"
+        )
+
+    def format_row(self, rowdata):
+        if self.widths is None:
+            return _row_format("%10s", " ", len(rowdata)) % tuple(rowdata)
+        return _width_format(tuple(self.widths)) % tuple(rowdata)
 
 
 class CSVTableFormatter(TableFormatter):
-    def headings(self, headers):
-        print(",".join("%s" % h for h in headers))
+    def format_headings(self, headers):
+        return ",".join("%s" % h for h in headers) + "\n"
 
-    def row(self, rowdata):
-        print(",".join("%s" % d for d in rowdata))
+    def format_row(self, rowdata):
+        return _row_format("%s", ",", len(rowdata)) % tuple(rowdata)
 
 
 class HTMLTableFormatter(TableFormatter):
-    def headings(self, headers):
-        print(
-            "<tr>" + " " + " ".join("<th>%s</th>" % h for h in headers) + " " + "</tr>"
+    def format_headings(self, headers):
+        return "<tr> " + " ".join("<th>%s</th>" % h for h in headers) + " </tr>\n"
+
+    def format_row(self, rowdata):
+        return _row_format("<td>%s</td>", " ", len(rowdata), "<tr> ", " </tr>") % tuple(
+            rowdata
         )
 
+
+# columnar binary tables, for handing big results to other tools without
+# turning every value into text. a file looks like:
+#
+#   b"COLTAB1\n"                magic, once at the start
+#   then one or more batches of rows, each:
+#     uint32 (little endian)    length of the batch metadata
+#     metadata (json, utf-8)    nrows, nbytes (size of the column data) and
+#                               per column its name, kind and the
+#                               [offset, nbytes] of each of its blocks,
+#                               padded with spaces to a multiple of 8
+#     column data               the blocks, each 8 byte aligned, offsets
+#                               counted from the end of the metadata
+#
+# column kinds (all numbers little endian):
+#   array   one block of raw array.array data, "typecode" says which
+#   str     arrow style: a block of nrows + 1 int64 offsets and a block with
+#           all the utf-8 text, value i is data[offsets[i]:offsets[i + 1]]
+#   dict    dictionary encoded strings: one block of codes ("typecode") and
+#           the "categories" they index, stored in the metadata
+COLUMNAR_MAGIC = b"COLTAB1\n"
+_fixed_typecodes = set("bBhHiIqQfd")
+
+
+def _aligned(n):
+    return -(-n // 8) * 8
+
+
+def _little_endian(block):
+    if sys.byteorder == "big" and isinstance(block, array):
+        block = array(block.typecode, block)
+        block.byteswap()
+    return block
+
+
+def _column_blocks(column):
+    """
+    Return (metadata entry, blocks) for one column of values
+    """
+    # views (see Exercises/2/columns.py) share their base column's storage.
+    # the rows are gathered through the view's range, whose bounds don't
+    # always work as slice bounds (reversed ranges down to 0 stop at -1)
+    rows = None
+    if hasattr(column, "base") and hasattr(column, "rows"):
+        column, rows = column.base, column.rows
+
+    # dictionary-encoded columns go out as they are, codes and categories
+    if hasattr(column, "codes") and hasattr(column, "categories"):
+        codes = column.codes
+        if rows is not None:
+            codes = array(codes.typecode, map(codes.__getitem__, rows))
+        entry = {"kind": "dict", "typecode": codes.typecode}
+        entry["categories"] = column.categories.values
+        return entry, [codes]
+
+    if isinstance(column, array) and column.typecode in _fixed_typecodes:
+        if rows is not None:
+            column = array(column.typecode, map(column.__getitem__, rows))
+        return {"kind": "array", "typecode": column.typecode}, [column]
+
+    values = list(column) if rows is None else [column[i] for i in rows]
+    types = set(map(type, values))
+    try:
+        if types <= {int}:
+            return {"kind": "array", "typecode": "q"}, [array("q", values)]
+        if types <= {int, float}:
+            return {"kind": "array", "typecode": "d"}, [array("d", values)]
+    except OverflowError:
+        pass
+    data = [v.encode() if type(v) is str else str(v).encode() for v in values]
+    offsets = array("q", [0])
+    offsets.extend(accumulate(map(len, data)))
+    return {"kind": "str"}, [offsets, b"".join(data)]
+
+
+def encode_columnar_batch(columns):
+    """
+    Encode a mapping of column name -> values as one batch
+    """
+    entries = []
+    blocks = []
+    offset = 0
+    nrows = 0
+    for name, column in columns.items():
+        entry, data = _column_blocks(column)
+        entry["name"] = name
+        entry["blocks"] = []
+        for block in data:
+            nbytes = len(block) * (block.itemsize if isinstance(block, array) else 1)
+            entry["blocks"].append([offset, nbytes])
+            offset += _aligned(nbytes)
+            blocks.append((block, nbytes))
+        entries.append(entry)
+        nrows = len(column)
+
+    meta = json.dumps({"nrows": nrows, "nbytes": offset, "columns": entries}).encode()
+    meta += b" " * (_aligned(4 + len(meta)) - 4 - len(meta))
+    parts = [struct.pack("<I", len(meta)), meta]
+    for block, nbytes in blocks:
+        parts.append(_little_endian(block))
+        parts.append(b"\0" * (_aligned(nbytes) - nbytes))
+    return b"".join(parts)
+
+
+def _cast(block, typecode):
+    if sys.byteorder == "big":
+        # array() would take a memoryview as an iterable of single bytes
+        values = array(typecode)
+        values.frombytes(block)
+        values.byteswap()
+        return values
+    return block.cast(typecode)
+
+
+class StringColumn(Sequence):
+    """
+    A str column read back from a columnar table, decoded on access
+    """
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):  # type: ignore
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        return str(self.data[self.offsets[i] : self.offsets[i + 1]], "utf-8")
+
+
+class DictColumn(Sequence):
+    """
+    A dictionary-encoded column read back from a columnar table
+    """
+
+    def __init__(self, codes, categories):
+        self.codes = codes
+        self.categories = categories
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, i):  # type: ignore
+        if isinstance(i, slice):
+            return [self.categories[c] for c in self.codes[i]]
+        return self.categories[self.codes[i]]
+
+    def __iter__(self):
+        return map(self.categories.__getitem__, self.codes)
+
+
+def read_columnar(buffer):
+    """
+    Yield every batch of a columnar table as a dict of column name -> column.
+    Columns are views straight onto buffer (bytes, mmap, ...), so numbers are
+    never copied or converted
+    """
+    view = memoryview(buffer)
+    if bytes(view[: len(COLUMNAR_MAGIC)]) != COLUMNAR_MAGIC:
+        raise ValueError("Not a columnar table")
+    pos = len(COLUMNAR_MAGIC)
+    while pos < len(view):
+        (meta_len,) = struct.unpack_from("<I", view, pos)
+        meta = json.loads(bytes(view[pos + 4 : pos + 4 + meta_len]))
+        base = pos + 4 + meta_len
+        columns = {}
+        for entry in meta["columns"]:
+            blocks = [view[base + o : base + o + n] for o, n in entry["blocks"]]
+            if entry["kind"] == "array":
+                column = _cast(blocks[0], entry["typecode"])
+            elif entry["kind"] == "dict":
+                column = DictColumn(
+                    _cast(blocks[0], entry["typecode"]), entry["categories"]
+                )
+            else:
+                column = StringColumn(_cast(blocks[0], "q"), blocks[1])
+            columns[entry["name"]] = column
+        yield columns
+        pos = base + meta["nbytes"]
+
+
+def load_columnar(filename):
+    """
+    Memory-map a columnar table file and return its batches. The columns
+    keep the mapping open for as long as they are around
+    """
+    with open(filename, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return list(read_columnar(mm))
+
+
+class ColumnarTableFormatter(TableFormatter):
+    """
+    Writes columnar binary tables, out has to be a binary stream
+    """
+
+    # rows are gathered up into batches this size before being turned around
+    batch_size = 65536
+
+    def __init__(self, out=None):
+        super().__init__(out)
+        self.headers = None
+        self.pending = []
+        self.started = False
+
+    def format_headings(self, headers):
+        raise TypeError("Columnar output is binary, use headings()")
+
+    def format_row(self, rowdata):
+        raise TypeError("Columnar output is binary, use row() or format_rows()")
+
+    def write(self, data):
+        if not self.started:
+            self.started = True
+            self.write(COLUMNAR_MAGIC)
+        (self.out if self.out is not None else sys.stdout.buffer).write(data)
+
+    def headings(self, headers):
+        self.flush()
+        self.headers = list(headers)
+
     def row(self, rowdata):
-        print(
-            "<tr>" + " " + " ".join("<td>%s</td>" % d for d in rowdata) + " " + "</tr>"
-        )
+        self.pending.append(rowdata)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def format_rows(self, rows):
+        rows = iter(rows)
+        while True:
+            self.pending.extend(islice(rows, self.batch_size - len(self.pending)))
+            if len(self.pending) < self.batch_size:
+                break
+            self.flush()
+        self.flush()
+
+    def flush(self):
+        """
+        Write out rows gathered by row()
+        """
+        if self.pending:
+            rows, self.pending = self.pending, []
+            self.write_columns(dict(zip(self.headers, zip(*rows))))
+
+    def write_columns(self, columns):
+        """
+        Write a batch straight from columns: a mapping of name -> values or
+        anything with a columns mapping, such as a DataCollection. Typed
+        arrays and dictionary-encoded columns are written as raw buffers
+        """
+        columns = getattr(columns, "columns", columns)
+        self.write(encode_columnar_batch(columns))
 
 
 str_to_formatter_map = {
     "text": TextTableFormatter,
     "csv": CSVTableFormatter,
     "html": HTMLTableFormatter,
+    "columnar": ColumnarTableFormatter,
 }
 
 
-def create_formatter(type):
+def create_formatter(type, out=None):
     if type not in str_to_formatter_map:
         AttributeError("Please provide a valid key: 'html', 'csv', or 'html'")
 
-    return str_to_formatter_map[type]()
+    return str_to_formatter_map[type](out)
 
 
-# makes a temporary patch to sys.stdout to cause all output to redirect to a different file
+# makes a temporary patch to sys.stdout to cause all output to redirect to a
+# different file.
+# formatters can just be handed the file instead (create_formatter(type, out=f)),
+# which doesn't touch global state
 class redirect_stdout:
     # accepts a file object
     def __init__(self, out_file):
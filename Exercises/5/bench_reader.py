@@ -0,0 +1,97 @@
+# benchmarks for reader.py, run from this directory: python bench_reader.py
+import csv
+import os
+import random
+import resource
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import reader
+
+RIDE_TYPES = [str, str, str, int]
+SIZES = [100_000, 200_000, 400_000, 800_000]
+
+
+def make_rides_file(filename, nrows):
+    """
+    Write a synthetic file shaped like ctabus.csv (route,date,daytype,rides)
+    """
+    rand = random.Random(nrows)
+    with open(filename, "w") as f:
+        f.write("route,date,daytype,rides\n")
+        for _ in range(nrows):
+            route = str(rand.randint(1, 200))
+            date = "%02d/%02d/%d" % (
+                rand.randint(1, 12),
+                rand.randint(1, 28),
+                rand.randint(2001, 2011),
+            )
+            daytype = rand.choice("WAU")
+            f.write(f"{route},{date},{daytype},{rand.randint(0, 30000)}\n")
+
+
+# ru_maxrss only ever goes up, so every measurement runs in a fresh process
+def _peak_rss(mode, filename):
+    if mode == "list":
+        total = sum(r["rides"] for r in reader.read_csv_as_dicts(filename, RIDE_TYPES))
+    else:
+        records = reader.iter_csv_as_dicts(filename, RIDE_TYPES)
+        records = reader.filter_records(records, lambda r: r["daytype"] == "W")
+        total = sum(r["rides"] for r in reader.project(records, ["route", "rides"]))
+    return total, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def measure(mode, filename):
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        _, peak = pool.submit(_peak_rss, mode, filename).result()
+    return peak
+
+
+def bench_lazy_rss():
+    print("rows       list peak RSS  lazy peak RSS")
+    with tempfile.TemporaryDirectory() as d:
+        for n in SIZES:
+            filename = os.path.join(d, f"rides_{n}.csv")
+            make_rides_file(filename, n)
+            eager = measure("list", filename)
+            lazy = measure("lazy", filename)
+            # ru_maxrss is in KB on linux
+            print(f"{n:<10} {eager / 1024:>10.1f} MB  {lazy / 1024:>10.1f} MB")
+
+
+def _zip_convert(headers, types, row):
+    # the old per-row path csv_as_dicts used before the compiled converters
+    return {h: f(v) for h, f, v in zip(headers, types, row)}
+
+
+def bench_compiled_converters(nrows=500_000):
+    with tempfile.TemporaryDirectory() as d:
+        filename = os.path.join(d, "rides.csv")
+        make_rides_file(filename, nrows)
+        with open(filename) as f:
+            rows = csv.reader(f)
+            headers = next(rows)
+            rows = list(rows)
+
+    # only time the conversion, the csv parsing is the same for both
+    start = time.perf_counter()
+    for row in rows:
+        _zip_convert(headers, RIDE_TYPES, row)
+    zipped = time.perf_counter() - start
+
+    start = time.perf_counter()
+    convert = reader.make_row_converter(headers, RIDE_TYPES)
+    for row in rows:
+        convert(row)
+    compiled = time.perf_counter() - start
+
+    print(
+        f"zip per row: {zipped:.3f}s  compiled: {compiled:.3f}s"
+        f"  ({zipped / compiled:.1f}x)"
+    )
+
+
+if __name__ == "__main__":
+    bench_lazy_rss()
+    bench_compiled_converters()
@@ -0,0 +1,112 @@
+import os
+import time
+
+from reader import csv_as_instances
+from stock import Tick
+
+
+def follow(filename, *, poll=0.001, max_poll=0.01, backoff=2.0, from_start=False):
+    """
+    Yield lines as they are appended to a file, like tail -f
+    """
+    f = open(filename)
+    if not from_start:
+        f.seek(0, os.SEEK_END)
+    partial = ""
+    delay = poll
+    try:
+        while True:
+            line = f.readline()
+            if line:
+                # the writer may be halfway through a line, hold on to it
+                # until the newline shows up
+                partial += line
+                if partial.endswith("\n"):
+                    yield partial
+                    partial = ""
+                delay = poll
+                continue
+
+            # nothing new: sleep, waiting a bit longer each time the file stays
+            # quiet (up to max_poll, which is the worst case latency)
+            time.sleep(delay)
+            delay = min(delay * backoff, max_poll)
+
+            # the log was rotated (replaced by a new file) or truncated, so
+            # start over at the top of whatever is there now
+            try:
+                stat = os.stat(filename)
+            except FileNotFoundError:
+                continue
+            if stat.st_ino != os.fstat(f.fileno()).st_ino or stat.st_size < f.tell():
+                # the old file may have grown since the last read
+                for line in f:
+                    partial += line
+                    if partial.endswith("\n"):
+                        yield partial
+                        partial = ""
+                f.close()
+                f = open(filename)
+                partial = ""
+    finally:
+        f.close()
+
+
+def follow_ticks(filename, cls=Tick, **kwargs):
+    """
+    Yield a cls instance for every record appended to a stock log
+    """
+    return csv_as_instances(
+        follow(filename, **kwargs), cls, headers=cls._fields, lazy=True
+    )
+
+
+# pipeline stages for tick streams, e.g.
+#   ibm = for_symbols(follow_ticks("stocklog.csv"), {"IBM"})
+#   windowed(changes_over(ibm, 0.5), 60, len)
+def for_symbols(ticks, names):
+    """
+    Keep the ticks for the given symbols
+    """
+    names = set(names)
+    return (t for t in ticks if t.name in names)
+
+
+def changes_over(ticks, threshold):
+    """
+    Keep the ticks whose change from the open is at least threshold either way
+    """
+    return (t for t in ticks if abs(t.change) >= threshold)
+
+
+def tick_seconds(tick):
+    # time is written as hh:mm.ss
+    hours, rest = tick.time.split(":")
+    minutes, seconds = rest.split(".")
+    return int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+
+
+def windowed(ticks, seconds, aggregate):
+    """
+    Group ticks into back to back windows of market time and yield
+    (window start in seconds, aggregate(ticks in the window)). A window is
+    finished once the first tick past its end arrives
+    """
+    start = None
+    batch = []
+    for tick in ticks:
+        t = tick_seconds(tick)
+        if start is not None and t >= start + seconds:
+            yield start, aggregate(batch)
+            batch = []
+        if not batch:
+            start = t - t % seconds
+        batch.append(tick)
+    if batch:
+        yield start, aggregate(batch)
+
+
+if __name__ == "__main__":
+    # run Data/stocksim.py in another terminal to make stocklog.csv grow
+    for tick in for_symbols(follow_ticks("../../Data/stocklog.csv"), ["IBM", "AA"]):
+        print(tick)
@@ -1,35 +1,98 @@
 # the csv class can take any iterable, not just files
 import csv
+import functools
 
 
-def convert_csv(lines, converter, *, headers):
+def make_row_converter(headers, types, target=dict):
+    """
+    Get the compiled row converter for a (headers, types, target) schema
+    """
+    return _compile_row_converter(
+        tuple(headers) if headers is not None else None, tuple(types), target
+    )
+
+
+# same trick namedtuple uses: write the source for one straight-line function
+# per schema and exec it, so converting a row doesn't re-zip anything
+@functools.lru_cache(maxsize=None)
+def _compile_row_converter(headers, types, target):
+    env = {"target": target}
+    args = []
+    for i, func in enumerate(types):
+        # csv already hands back strings, so skip the call entirely for str
+        if func is str:
+            args.append(f"row[{i}]")
+        else:
+            env[f"f{i}"] = func
+            args.append(f"f{i}(row[{i}])")
+
+    if target is dict:
+        body = "{" + ", ".join(f"{h!r}: {a}" for h, a in zip(headers, args)) + "}"
+    else:
+        body = "target(" + ", ".join(args) + ")"
+
+    # rows shorter than the schema (a blank line comes back as []) go through
+    # the zip-based conversion, which stops at the end of the row
+    def short(row):
+        if target is dict:
+            return {h: f(v) for h, f, v in zip(headers, types, row)}
+        return target(*[f(v) for f, v in zip(types, row)])
+
+    env["short"] = short
+    exec(
+        f"def convert(row):\n"
+        f"    if len(row) < {len(types)}:\n"
+        f"        return short(row)\n"
+        f"    return {body}\n",
+        env,
+    )
+    return env["convert"]
+
+
+def convert_csv(lines, converter, *, headers, lazy=False):
     """
     Takes lines and converts them in some way the user specifies
     """
     rows = csv.reader(lines)
-    headers = next(rows)
-    return list(map(lambda row: converter(headers, row), rows))
+    if headers is None:
+        headers = next(rows)
+    records = map(lambda row: converter(headers, row), rows)
+    # map is already lazy, so only build the list if the caller wants one
+    return records if lazy else list(records)
+
+
+def convert_csv_compiled(lines, make_converter, *, headers, lazy=False):
+    """
+    Like convert_csv, but make_converter(headers) builds the row function once
+    """
+    rows = csv.reader(lines)
+    if headers is None:
+        headers = next(rows)
+    records = map(make_converter(headers), rows)
+    return records if lazy else list(records)
 
 
-def csv_as_dicts(lines, types, *, headers=None):
+def csv_as_dicts(lines, types, *, headers=None, lazy=False):
     """
     Takes lines and reads them as dicts
     """
-    return convert_csv(
+    return convert_csv_compiled(
         lines,
-        lambda headers, row: {h: f(v) for h, f, v in zip(headers, types, row)},
+        lambda headers: make_row_converter(headers, types),
         headers=headers,
+        lazy=lazy,
     )
 
 
-def csv_as_instances(lines, cls, *, headers=None):
+def csv_as_instances(lines, cls, *, headers=None, lazy=False):
     """
     Takes lines and returns them as instances
     """
-    return convert_csv(
+    return convert_csv_compiled(
         lines,
-        lambda _, row: cls.from_row(row),
+        lambda _: cls.from_row,
         headers=headers,
+        lazy=lazy,
     )
 
 
@@ -47,3 +110,41 @@ def read_csv_as_instances(filename, cls, *, headers=None):
     """
     with open(filename) as f:
         return csv_as_instances(f, cls, headers=headers)
+
+
+# the generator versions keep the file open for as long as the caller is still
+# pulling records, so only one row is ever in memory at a time
+def iter_csv_as_dicts(filename, types, *, headers=None):
+    """
+    Lazily read CSV data as dictionaries, one record at a time
+    """
+    with open(filename) as f:
+        yield from csv_as_dicts(f, types, headers=headers, lazy=True)
+
+
+def iter_csv_as_instances(filename, cls, *, headers=None):
+    """
+    Lazily read csv data as instances, one record at a time
+    """
+    with open(filename) as f:
+        yield from csv_as_instances(f, cls, headers=headers, lazy=True)
+
+
+# small pipeline stages that can be chained onto any of the lazy readers, e.g.
+#   project(filter_records(iter_csv_as_dicts(...), pred), ["route", "rides"])
+def filter_records(records, predicate):
+    """
+    Lazily keep the records where predicate(record) is true
+    """
+    return (r for r in records if predicate(r))
+
+
+def project(records, fields):
+    """
+    Lazily narrow each record (dict or instance) down to a dict of fields
+    """
+    for r in records:
+        if isinstance(r, dict):
+            yield {f: r[f] for f in fields}
+        else:
+            yield {f: getattr(r, f) for f in fields}
@@ -1,8 +1,16 @@
+from reader import make_row_converter
+
+
 def read_instance_from_row(cls):
     @classmethod
     def from_row(cls, row):
-        values = [f(v) for f, v in zip(cls._types, row)]
-        return cls(*values)
+        # compile the converter the first time a class is used (subclasses get
+        # their own since they may swap out _types) and stash it on the class
+        convert = cls.__dict__.get("_row_converter")
+        if convert is None:
+            convert = make_row_converter(None, cls._types, cls)
+            cls._row_converter = convert
+        return convert(row)
 
     cls.from_row = from_row
     return cls
@@ -19,3 +27,38 @@ class Stock:
 
     def __repr__(self):
         return f"{self.__class__.__name__}(name='{self.name}', price={self.price}, volume={self.volume})"
+
+
+# one line of the simulator's stocklog.csv (Data/stocksim.py), which has no
+# header row: name, price, date, time, change, open, high, low, volume
+@read_instance_from_row
+class Tick:
+    _types = [str, float, str, str, float, float, float, float, int]
+    _fields = [
+        "name",
+        "price",
+        "date",
+        "time",
+        "change",
+        "open",
+        "high",
+        "low",
+        "volume",
+    ]
+
+    def __init__(self, name, price, date, time, change, open, high, low, volume):
+        self.name = name
+        self.price = price
+        self.date = date
+        self.time = time
+        self.change = change
+        self.open = open
+        self.high = high
+        self.low = low
+        self.volume = volume
+
+    def __repr__(self):
+        return (
+            f"{self.__class__.__name__}(name='{self.name}', price={self.price}, "
+            f"time='{self.time}', change={self.change})"
+        )